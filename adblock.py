@@ -0,0 +1,559 @@
+import gc
+import glob
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from urllib.parse import urlsplit
+
+class HostBlocklist:
+    """Blocked domains in a hash set, matched by walking the host's suffixes
+
+    "ads.example.com" is checked as "ads.example.com", "example.com" and
+    "com" - one set lookup per label, however long the list is - so a
+    listed domain blocks its subdomains without matching look-alikes such
+    as "notexample.com" or "example.com.evil.org".
+    """
+
+    def __init__(self, domains=()):
+        self.domains = {self.normalize(domain) for domain in domains if domain}
+
+    def __len__(self):
+        return len(self.domains)
+
+    @staticmethod
+    def normalize(host):
+        return host.strip().lower().rstrip('.')
+
+    def add(self, domain):
+        self.domains.add(self.normalize(domain))
+
+    def matches(self, host):
+        """Whether host or any parent domain of it is listed"""
+        host = self.normalize(host)
+        while host:
+            if host in self.domains:
+                return True
+            dot = host.find('.')
+            if dot == -1:
+                return False
+            host = host[dot + 1:]
+        return False
+
+
+# ADBLOCK PLUS FILTERS
+# Network rules only ("||ads.example.com^$script,third-party", "@@..." exceptions);
+# element hiding rules and options we cannot honor are skipped.
+
+# Bump when the compiled layout changes so stale caches are rebuilt
+ENGINE_VERSION = 1
+
+RESOURCE_TYPES = (
+    'other', 'script', 'image', 'stylesheet', 'object', 'xmlhttprequest', 'subdocument',
+    'document', 'font', 'media', 'websocket', 'ping',
+)
+TYPE_BITS = {name: 1 << i for i, name in enumerate(RESOURCE_TYPES)}
+TYPE_ALIASES = {'xhr': 'xmlhttprequest', 'css': 'stylesheet', 'frame': 'subdocument', 'object-subrequest': 'object'}
+# Rules without type options apply to everything but top-level documents
+DEFAULT_TYPES = (1 << len(RESOURCE_TYPES)) - 1 & ~TYPE_BITS['document']
+
+# Options that only narrow where a rule applies elsewhere; safe to ignore for network blocking
+IGNORED_OPTIONS = {'important', 'collapse', '~collapse', 'elemhide', 'generichide', 'genericblock', 'all'}
+
+_TOKEN = re.compile(r'[a-z0-9%]{3,}')
+_PATTERN_TOKEN = re.compile(r'[a-z0-9%]+')
+_PLAIN_HOST = re.compile(r'^\|\|([a-z0-9.-]+)\^?$')
+_SEPARATOR = r'(?:[^\w\-.%]|$)'
+
+# Rule tuple fields
+PATTERN, CASE, TYPES, THIRD_PARTY, INCLUDE, EXCLUDE, TEXT = range(7)
+
+def base_domain(host):
+    """Registrable part of a host, roughly (no public suffix list): example.co.uk, example.com"""
+    labels = host.split('.')
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in ('co', 'com', 'net', 'org', 'gov', 'ac', 'edu'):
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+def _host_suffixes(host):
+    """host, then each parent domain"""
+    while host:
+        yield host
+        dot = host.find('.')
+        if dot == -1:
+            return
+        host = host[dot + 1:]
+
+def _pattern_regex(pattern):
+    """Translate an ABP pattern to a regex source"""
+    if len(pattern) > 1 and pattern.startswith('/') and pattern.endswith('/'):
+        return pattern[1:-1]
+    prefix = suffix = ''
+    if pattern.startswith('||'):
+        prefix, pattern = r'^[a-z][a-z0-9+.-]*://(?:[^/?#]*\.)?', pattern[2:]
+    elif pattern.startswith('|'):
+        prefix, pattern = '^', pattern[1:]
+    if pattern.endswith('|'):
+        suffix, pattern = '$', pattern[:-1]
+    body = ''.join(
+        '.*' if char == '*' else _SEPARATOR if char == '^' else re.escape(char)
+        for char in pattern
+    )
+    return prefix + body + suffix
+
+def _pattern_tokens(pattern):
+    """Tokens that must appear whole in any URL the pattern matches"""
+    if pattern.startswith('/') and pattern.endswith('/') and len(pattern) > 1:
+        return []
+    tokens = []
+    for match in _PATTERN_TOKEN.finditer(pattern.lower()):
+        start, end = match.span()
+        before = pattern[start - 1] if start else None
+        after = pattern[end] if end < len(pattern) else None
+        # An unanchored edge or a wildcard means the URL token may be longer
+        if before is None or before == '*' or (before == '|' and not pattern.startswith('|')):
+            continue
+        if after is None or after == '*' or (after == '|' and end != len(pattern) - 1):
+            continue
+        if end - start >= 3:
+            tokens.append(match.group())
+    return tokens
+
+def parse_filter(line):
+    """Parse one ABP line into (is_exception, rule, plain_host, tokens), or None to skip it"""
+    line = line.strip()
+    if not line or line.startswith(('!', '[')) or '##' in line or '#@#' in line or '#?#' in line or '#$#' in line:
+        return None
+    exception = line.startswith('@@')
+    if exception:
+        line = line[2:]
+
+    pattern, options = line, ''
+    dollar = line.rfind('$')
+    if dollar != -1 and not (line.startswith('/') and line.endswith('/')):
+        pattern, options = line[:dollar], line[dollar + 1:]
+
+    types = 0
+    excluded_types = 0
+    third_party = None
+    match_case = False
+    include = exclude = None
+    for option in filter(None, options.split(',')):
+        name = option.lower()
+        negated = name.startswith('~')
+        bare = TYPE_ALIASES.get(name.lstrip('~'), name.lstrip('~'))
+        if bare in TYPE_BITS:
+            if negated:
+                excluded_types |= TYPE_BITS[bare]
+            else:
+                types |= TYPE_BITS[bare]
+        elif bare == 'third-party' or bare == '3p':
+            third_party = not negated
+        elif bare == 'first-party' or bare == '1p':
+            third_party = negated
+        elif name == 'match-case':
+            match_case = True
+        elif name.startswith('domain='):
+            domains = option[7:].lower().split('|')
+            include = tuple(d for d in domains if d and not d.startswith('~')) or None
+            exclude = tuple(d[1:] for d in domains if d.startswith('~')) or None
+        elif name not in IGNORED_OPTIONS:
+            # csp=, redirect=, popup, ... change more than whether a request loads
+            return None
+    types = (types or DEFAULT_TYPES) & ~excluded_types
+    if not types:
+        return None
+
+    if pattern in ('', '*'):
+        pattern = '*'
+    lowered = pattern if match_case else pattern.lower()
+    plain = _PLAIN_HOST.match(lowered)
+    plain_host = plain.group(1) if plain else None
+    regex = None if plain_host else _pattern_regex(lowered)
+    rule = (regex, match_case, types, third_party, include, exclude, ('@@' if exception else '') + line)
+    return exception, rule, plain_host, [] if plain_host else _pattern_tokens(lowered)
+
+class _RuleSet:
+    """Rules of one kind (blocking or exception) indexed for lookup"""
+
+    def __init__(self):
+        self.bare_hosts = set()  # option-less "||host^" rules - by far the most common kind
+        self.hosts = {}          # other "||host^" rules, found by walking host suffixes
+        self.tokens = {}         # token -> rules whose pattern contains it
+        self.generic = []        # rules with no usable token
+
+    def __len__(self):
+        return (len(self.bare_hosts) + sum(map(len, self.hosts.values()))
+                + sum(map(len, self.tokens.values())) + len(self.generic))
+
+    def find(self, engine, url, url_lower, host, url_tokens, context):
+        type_bit = context[0]
+        for suffix in _host_suffixes(host):
+            if suffix in self.bare_hosts and DEFAULT_TYPES & type_bit:
+                return (None, False, DEFAULT_TYPES, None, None, None, f"||{suffix}^")
+            for rule in self.hosts.get(suffix, ()):
+                if engine.applies(rule, url, url_lower, context):
+                    return rule
+        for token in url_tokens:
+            for rule in self.tokens.get(token, ()):
+                if engine.applies(rule, url, url_lower, context):
+                    return rule
+        for rule in self.generic:
+            if engine.applies(rule, url, url_lower, context):
+                return rule
+        return None
+
+class FilterEngine:
+    """Adblock Plus network filters compiled into host and token indexes
+
+    Each rule is filed under its host (for plain "||host^" rules) or under
+    the rarest whole token of its pattern, so a request only tests the rules
+    whose token appears in its URL. Pattern regexes are compiled on first use.
+    """
+
+    def __init__(self):
+        self.block = _RuleSet()
+        self.allow = _RuleSet()
+        self.skipped = 0
+        self._regexes = {}
+
+    def __len__(self):
+        return len(self.block) + len(self.allow)
+
+    @classmethod
+    def from_lines(cls, lines):
+        engine = cls()
+        parsed = []
+        token_counts = {}
+        for line in lines:
+            result = parse_filter(line)
+            if result is None:
+                if line.strip() and not line.startswith(('!', '[')):
+                    engine.skipped += 1
+                continue
+            parsed.append(result)
+            for token in result[3]:
+                token_counts[token] = token_counts.get(token, 0) + 1
+
+        for exception, rule, plain_host, tokens in parsed:
+            rules = engine.allow if exception else engine.block
+            if plain_host and rule[TYPES:TEXT] == (DEFAULT_TYPES, None, None, None):
+                rules.bare_hosts.add(plain_host)
+            elif plain_host:
+                rules.hosts.setdefault(plain_host, []).append(rule)
+            elif tokens:
+                rarest = min(tokens, key=lambda token: (token_counts[token], -len(token)))
+                rules.tokens.setdefault(rarest, []).append(rule)
+            else:
+                rules.generic.append(rule)
+        return engine
+
+    @classmethod
+    def from_files(cls, paths):
+        def lines():
+            for path in paths:
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    yield from f
+        return cls.from_lines(lines())
+
+    def __getstate__(self):
+        # Compiled regexes are rebuilt lazily rather than pickled
+        state = self.__dict__.copy()
+        state['_regexes'] = {}
+        return state
+
+    def match(self, url, source_host='', resource_type='other'):
+        """Return the blocking rule text for a request, or None if it may load"""
+        url_lower = url.lower()
+        host = urlsplit(url_lower).hostname or ''
+        source_host = (source_host or '').lower()
+        third_party = bool(source_host) and base_domain(host) != base_domain(source_host)
+        context = (TYPE_BITS.get(resource_type, TYPE_BITS['other']), third_party, source_host)
+        url_tokens = set(_TOKEN.findall(url_lower))
+
+        rule = self.block.find(self, url, url_lower, host, url_tokens, context)
+        if rule is None or self.allow.find(self, url, url_lower, host, url_tokens, context):
+            return None
+        return rule[TEXT]
+
+    def applies(self, rule, url, url_lower, context):
+        type_bit, third_party, source_host = context
+        if not rule[TYPES] & type_bit:
+            return False
+        if rule[THIRD_PARTY] is not None and rule[THIRD_PARTY] != third_party:
+            return False
+        if rule[INCLUDE] and not any(s in rule[INCLUDE] for s in _host_suffixes(source_host)):
+            return False
+        if rule[EXCLUDE] and any(s in rule[EXCLUDE] for s in _host_suffixes(source_host)):
+            return False
+        if rule[PATTERN] is None:
+            return True
+        regex = self._regexes.get(rule[PATTERN])
+        if regex is None:
+            try:
+                regex = re.compile(rule[PATTERN], 0 if rule[CASE] else re.IGNORECASE)
+            except re.error:
+                regex = re.compile(r'(?!)')
+            self._regexes[rule[PATTERN]] = regex
+        return regex.search(url if rule[CASE] else url_lower) is not None
+
+def load_filter_engine(paths, cache_path):
+    """Load filter lists through a pickled cache keyed on the lists' size and mtime
+
+    Parsing a 100k-rule list takes seconds; unpickling the compiled engine
+    takes milliseconds. The cache is rebuilt whenever a list changes.
+    """
+    sources = [(os.path.abspath(p), os.path.getsize(p), os.path.getmtime(p)) for p in sorted(paths)]
+    # The cache holds only containers of strings; collecting mid-load just wastes time
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(cache_path, 'rb') as f:
+            version, cached_sources, engine = pickle.load(f)
+        if version == ENGINE_VERSION and cached_sources == sources:
+            return engine
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, TypeError):
+        pass
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    engine = FilterEngine.from_files([source[0] for source in sources])
+    temp_path = f'{cache_path}.{threading.get_ident()}.tmp'  # windows may compile the same folder at once
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump((ENGINE_VERSION, sources, engine), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️ Could not write filter cache: {e}")
+    return engine
+
+# HOSTS-FILE BLOCKLISTS
+# Hosts files ("0.0.0.0 ads.example.com") and plain domain lists are compiled
+# into a sorted, label-reversed domain file that is memory-mapped at startup.
+DOMAIN_SET_MAGIC = b'GTDOMS1\n'
+DOMAIN_SET_VERSION = 1
+
+# Entries every stock hosts file carries for the machine itself
+LOCAL_HOSTNAMES = {
+    'localhost', 'localhost.localdomain', 'local', 'broadcasthost', 'ip6-localhost',
+    'ip6-loopback', 'ip6-localnet', 'ip6-mcastprefix', 'ip6-allnodes', 'ip6-allrouters', '0.0.0.0',
+}
+
+def parse_hosts_file(lines):
+    """Yield domains from hosts-format or one-domain-per-line lists"""
+    for line in lines:
+        fields = line.split('#', 1)[0].lower().split()
+        # Hosts format puts the address first; plain lists are just the name
+        for name in fields[1:] if len(fields) > 1 else fields:
+            name = name.rstrip('.')
+            if '.' in name and name not in LOCAL_HOSTNAMES:
+                yield name
+
+# Labels are joined with a byte that sorts below every hostname character, so
+# a domain's subdomains form one contiguous run right after it
+LABEL_SEPARATOR = b'\x00'
+
+def _domain_key(host):
+    return LABEL_SEPARATOR.join(reversed(host.encode('utf-8').split(b'.')))
+
+def build_domain_set(domains, path, sources=()):
+    """Write domains as a sorted array of label-reversed names for CompactDomainSet
+
+    Names already covered by a listed parent domain are dropped. The file is
+    written next to path and moved into place, so readers never see half of it.
+    """
+    entries = []
+    parent = None
+    for key in sorted({_domain_key(HostBlocklist.normalize(domain)) for domain in domains if domain}):
+        if parent is None or not key.startswith(parent):
+            entries.append(key)
+            parent = key + LABEL_SEPARATOR
+
+    offsets = array('I', [0])
+    for entry in entries:
+        offsets.append(offsets[-1] + len(entry))
+    header = json.dumps({
+        'version': DOMAIN_SET_VERSION, 'byteorder': sys.byteorder,
+        'count': len(entries), 'sources': [list(source) for source in sources],
+    }).encode('utf-8')
+    header += b' ' * (-(len(DOMAIN_SET_MAGIC) + 4 + len(header)) % 4)  # keep offsets 4-byte aligned
+
+    temp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(DOMAIN_SET_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        offsets.tofile(f)
+        f.write(b''.join(entries))
+    os.replace(temp_path, path)
+    return len(entries)
+
+class CompactDomainSet:
+    """Read-only blocked-domain set memory-mapped from a build_domain_set file
+
+    Names are stored label-reversed in sorted order with no listed domain's
+    subdomains, so the greatest entry not above the host's key is the only
+    one that can cover it: a lookup is a single floor search. Every
+    INDEX_STRIDE-th entry is kept on the heap to narrow that search with a
+    C-level bisect. The rest lives in the OS page cache, so a 300k-domain
+    list costs a few MB of shared, file-backed memory instead of tens of MB
+    of str objects. Matches the same host suffixes as HostBlocklist.
+    """
+    INDEX_STRIDE = 64
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._map[:len(DOMAIN_SET_MAGIC)] != DOMAIN_SET_MAGIC:
+                raise ValueError(f"{path} is not a domain set file")
+            start = len(DOMAIN_SET_MAGIC)
+            header_length, = struct.unpack_from('<I', self._map, start)
+            start += 4
+            self.header = json.loads(self._map[start:start + header_length])
+            if self.header.get('version') != DOMAIN_SET_VERSION or self.header.get('byteorder') != sys.byteorder:
+                raise ValueError(f"{path} was built by an incompatible version")
+            start += header_length
+            self._count = self.header['count']
+            offsets_end = start + 4 * (self._count + 1)
+            self._offsets = memoryview(self._map)[start:offsets_end].cast('I')
+            self._data = offsets_end
+        except Exception:
+            self._map.close()
+            raise
+        self._index = [self[i] for i in range(0, self._count, self.INDEX_STRIDE)]
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        return self._map[self._data + self._offsets[index]:self._data + self._offsets[index + 1]]
+
+    def matches(self, host):
+        """Whether host or any parent domain of it is listed"""
+        key = _domain_key(HostBlocklist.normalize(host))
+        block = bisect_right(self._index, key) - 1
+        if block < 0:
+            return False
+        # Floor search inside the block; entry lo is always <= key
+        lo = block * self.INDEX_STRIDE
+        hi = min(lo + self.INDEX_STRIDE, self._count)
+        data, offsets, entries = self._data, self._offsets, self._map
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if entries[data + offsets[mid]:data + offsets[mid + 1]] <= key:
+                lo = mid
+            else:
+                hi = mid
+        entry = entries[data + offsets[lo]:data + offsets[lo + 1]]
+        return key == entry or key.startswith(entry + LABEL_SEPARATOR)
+
+    def close(self):
+        self._offsets.release()
+        self._map.close()
+
+def load_domain_set(paths, cache_dir):
+    """Map the compiled domain set for these hosts files, rebuilding it if any changed
+
+    Each set of source stamps compiles to its own file, so a rebuild never
+    overwrites a file another CompactDomainSet still has mapped; stale
+    files are removed once they are no longer open.
+    """
+    sources = [[os.path.abspath(p), os.path.getsize(p), os.path.getmtime(p)] for p in sorted(paths)]
+    digest = hashlib.sha1(json.dumps(sources).encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f'hosts-{digest}.domains')
+    try:
+        domain_set = CompactDomainSet(cache_path)
+        if domain_set.header.get('sources') == sources:
+            return domain_set
+        domain_set.close()
+    except (OSError, ValueError):
+        pass
+
+    def domains():
+        for path in paths:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                yield from parse_hosts_file(f)
+    build_domain_set(domains(), cache_path, sources)
+
+    for stale in glob.glob(os.path.join(cache_dir, 'hosts-*.domains')):
+        if stale != cache_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass  # still mapped on Windows; removed after the next rebuild
+    return CompactDomainSet(cache_path)
+
+# BLOCKLIST FOLDERS
+FILTER_LIST_EXTENSION = '.txt'
+HOSTS_LIST_EXTENSION = '.hosts'
+
+def blocklist_sources(folder):
+    """(path, size, mtime) of every list in folder; changes whenever a list does"""
+    sources = []
+    for extension in (FILTER_LIST_EXTENSION, HOSTS_LIST_EXTENSION):
+        for path in sorted(glob.glob(os.path.join(folder, '*' + extension))):
+            try:
+                sources.append((path, os.path.getsize(path), os.path.getmtime(path)))
+            except OSError:
+                pass  # removed while listing
+    return sources
+
+class Blocklists:
+    """Everything compiled from one blocklists folder, swapped in as a single reference
+
+    Instances are never modified after compile_blocklists returns them, so
+    a request interceptor can keep matching against an old one while a
+    rebuilt one replaces it.
+    """
+
+    def __init__(self, sources=(), filter_engine=None, domain_set=None, seconds=0.0):
+        self.sources = list(sources)
+        self.filter_engine = filter_engine
+        self.domain_set = domain_set
+        self.seconds = seconds
+
+    @property
+    def rule_count(self):
+        return len(self.filter_engine) if self.filter_engine is not None else 0
+
+    @property
+    def host_count(self):
+        return len(self.domain_set) if self.domain_set is not None else 0
+
+    def match(self, url, host, source_host, resource_type):
+        """Whether a request should be blocked by any compiled list"""
+        if self.domain_set is not None and self.domain_set.matches(host):
+            return True
+        return self.filter_engine is not None and self.filter_engine.match(url, source_host, resource_type) is not None
+
+def compile_blocklists(folder, progress=None):
+    """Load the Adblock Plus (*.txt) and hosts (*.hosts) lists in folder
+
+    Compiled forms are cached in folder/.cache, so an unchanged folder loads
+    in milliseconds. progress(done, total) is called per list kind.
+    """
+    started = time.perf_counter()
+    sources = blocklist_sources(folder)
+    filter_paths = [path for path, _, _ in sources if path.endswith(FILTER_LIST_EXTENSION)]
+    hosts_paths = [path for path, _, _ in sources if path.endswith(HOSTS_LIST_EXTENSION)]
+    cache_dir = os.path.join(folder, '.cache')
+    os.makedirs(cache_dir, exist_ok=True)
+
+    filter_engine = load_filter_engine(filter_paths, os.path.join(cache_dir, 'filters.cache')) if filter_paths else None
+    if progress:
+        progress(1, 2)
+    domain_set = load_domain_set(hosts_paths, cache_dir) if hosts_paths else None
+    if progress:
+        progress(2, 2)
+    return Blocklists(sources, filter_engine, domain_set, time.perf_counter() - started)
@@ -0,0 +1,555 @@
+import heapq
+import math
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from database import frecency_add
+
+# Same word boundaries as the full-text index (underscore is a separator)
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+# Parts of nearly every URL that nobody types to find a page
+URL_NOISE = {'http', 'https', 'www', 'html', 'htm', 'php', 'aspx', 'index'}
+
+# Longer "words" are session ids and hashes
+MAX_TOKEN_LENGTH = 32
+
+def tokenize(url, title):
+    """Lower-cased words of a page's URL (scheme dropped) and title"""
+    url = url.lower()
+    words = set(TOKEN_PATTERN.findall(f"{url.partition('://')[2] or url} {(title or '').lower()}"))
+    words -= URL_NOISE
+    return {word for word in words if len(word) <= MAX_TOKEN_LENGTH and not word.isdigit()}
+
+def combine_scores(first, second):
+    """Add two log2-scale frecency scores (None = nothing to add)"""
+    if first is None or second is None:
+        return second if first is None else first
+    high, low = max(first, second), min(first, second)
+    return high + math.log2(1 + 2 ** (low - high))
+
+class PrefixIndex:
+    """Every history and bookmark URL, searchable by word prefix in frecency order
+
+    Words are kept in one sorted vocabulary, so a prefix is a bisected range
+    of it, and each word maps to the ids of the pages containing it. Ranking
+    comes from top lists of (-score, id), at most TOP_K long: one per word
+    used by more than TOP_K pages, and one per prefix whose vocabulary range
+    is wider than RANGE_LIMIT words (built on first use, one- and two-letter
+    prefixes up front). A prefix query merges at most RANGE_LIMIT short
+    lists or reads one cached list, whatever the size of the history.
+    Further words filter the longest word's top list; when too few of its
+    entries survive, every word's postings are intersected in full.
+
+    Scores only grow on visits, so raising an entry is a single insertion
+    into each top list it belongs to. Removed entries, and demoted ones that fall
+    below a list's last entry, are dropped, which keeps lists exact but shorter; a list
+    that falls under half of TOP_K is rebuilt on its next query.
+
+    Not thread-safe; Autocomplete serializes access.
+    """
+    TOP_K = 32
+    RANGE_LIMIT = 64
+    PREFIX_CACHE_SIZE = 4096
+    WARM_PREFIX_LENGTH = 2
+    BOOKMARK_BONUS = 2.0  # frecency half-lives a bookmark is worth on top of its age
+    POSTINGS_PER_CHECK = 256  # ids unioned in about the time one entry's words are checked
+
+    def __init__(self):
+        self.urls = []                    # id -> url (None once removed)
+        self.titles = []
+        self.history_scores = array('d')  # id -> frecency, NaN when never visited
+        self.bookmark_scores = {}         # id -> score of bookmarked entries
+        self.scores = array('d')          # id -> ranking score
+        self.ids = {}                     # url -> id
+        self.vocabulary = []              # sorted distinct words
+        self.postings = {}                # word -> array of ids
+        self.unlinked = {}                # word -> ids removed from its postings, not yet compacted away
+        self.word_top = {}                # word -> top list, for words in more than TOP_K pages
+        self.prefix_top = {}              # prefix -> top list, least recently built first
+
+    def __len__(self):
+        return len(self.ids)
+
+    # BUILDING
+    def load(self, history, bookmarks):
+        """Bulk-load (url, title, frecency) history and (url, title, created_at) bookmark rows
+
+        A bookmarked page is listed under its bookmark title.
+        """
+        for url, title, created_at in bookmarks:
+            self._add_entry(url, title, None, self._bookmark_score(created_at), sort=False)
+        for url, title, frecency in history:
+            entry_id = self.ids.get(url)
+            if entry_id is None:
+                self._add_entry(url, title, frecency, sort=False)
+            else:
+                self.history_scores[entry_id] = frecency
+                self.scores[entry_id] = self._score(entry_id)
+        self.vocabulary = sorted(self.postings)
+        for word, ids in self.postings.items():
+            if len(ids) > self.TOP_K:
+                self.word_top[word] = self._top_of(ids)
+        self.prefix_top.clear()
+        for length in range(1, self.WARM_PREFIX_LENGTH + 1):
+            for prefix in sorted({word[:length] for word in self.vocabulary if len(word) >= length}):
+                self._candidates(prefix)
+
+    def _bookmark_score(self, created_at):
+        return frecency_add(None, created_at or time.time(), 1) + self.BOOKMARK_BONUS
+
+    def _score(self, entry_id):
+        history = self.history_scores[entry_id]
+        return combine_scores(None if math.isnan(history) else history, self.bookmark_scores.get(entry_id))
+
+    def _add_entry(self, url, title, frecency, bookmark_score=None, sort=True):
+        entry_id = len(self.urls)
+        self.ids[url] = entry_id
+        self.urls.append(url)
+        self.titles.append(title or url)
+        self.history_scores.append(math.nan if frecency is None else frecency)
+        if bookmark_score is not None:
+            self.bookmark_scores[entry_id] = bookmark_score
+        self.scores.append(self._score(entry_id))
+        self._index_words(entry_id, tokenize(url, title), sort)
+        return entry_id
+
+    def _index_words(self, entry_id, words, sort=True):
+        for word in words:
+            gone = self.unlinked.get(word)
+            if gone and entry_id in gone:
+                gone.discard(entry_id)  # never compacted out - still in the array
+                continue
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = array('I')
+                if sort:
+                    insort(self.vocabulary, word)
+            ids.append(entry_id)
+            if sort and len(ids) == self.TOP_K + 1:
+                self.word_top[word] = self._top_of(self._live_ids(word))
+
+    def _unindex_words(self, entry_id, words):
+        for word in words:
+            ids = self.postings.get(word)
+            if ids is None:
+                continue
+            # Removing from the middle of an array is O(n) - batch it, compacting
+            # once a quarter of the word's ids are gone
+            gone = self.unlinked.setdefault(word, set())
+            gone.add(entry_id)
+            if len(gone) * 4 < len(ids):
+                continue
+            del self.unlinked[word]
+            ids = array('I', (i for i in ids if i not in gone))
+            if ids:
+                self.postings[word] = ids
+            else:
+                del self.postings[word]
+                del self.vocabulary[bisect_left(self.vocabulary, word)]
+                self.word_top.pop(word, None)
+        self._drop(entry_id, words)
+
+    def _live_ids(self, word):
+        gone = self.unlinked.get(word)
+        ids = self.postings[word]
+        return [i for i in ids if i not in gone] if gone else ids
+
+    # TOP LISTS
+    def _top_of(self, ids):
+        scores = self.scores
+        return heapq.nsmallest(self.TOP_K, ((-scores[i], i) for i in ids))
+
+    def _lists_of(self, words):
+        """Every existing top list an entry with these words can appear in"""
+        for word in words:
+            top = self.word_top.get(word)
+            if top is not None:
+                yield top
+        for prefix in {word[:length] for word in words for length in range(1, len(word) + 1)}:
+            top = self.prefix_top.get(prefix)
+            if top is not None:
+                yield top
+
+    def _rerank(self, entry_id, words, raised=True):
+        """Move an entry whose score changed (or that just joined these words) in its top lists"""
+        key = (-self.scores[entry_id], entry_id)
+        for top in self._lists_of(words):
+            listed = False
+            for i, (_, other) in enumerate(top):
+                if other == entry_id:
+                    del top[i]
+                    listed = True
+                    break
+            # A shortened list is still exact down to its last entry - only insert above it
+            if (listed and raised) or (top and key < top[-1]):
+                insort(top, key)
+                if len(top) > self.TOP_K:
+                    top.pop()
+
+    def _drop(self, entry_id, words):
+        """Take an entry that left these words out of their top lists"""
+        for top in self._lists_of(words):
+            for i, (_, other) in enumerate(top):
+                if other == entry_id:
+                    del top[i]
+                    break
+
+    def _candidates(self, prefix):
+        """Top entries with a word starting with prefix, as a sorted (-score, id) list
+
+        Also returns whether the list holds every such entry.
+        """
+        top = self.prefix_top.get(prefix)
+        if top is not None and len(top) >= self.TOP_K // 2:
+            return top, False
+
+        vocabulary = self.vocabulary
+        start = bisect_left(vocabulary, prefix)
+        end = bisect_left(vocabulary, prefix + '\uffff', start)
+        scores = self.scores
+        candidates = set()
+        exhaustive = True
+        for word in vocabulary[start:end]:
+            word_top = self.word_top.get(word)
+            if word_top is not None:
+                if len(word_top) < self.TOP_K // 2:
+                    word_top = self.word_top[word] = self._top_of(self._live_ids(word))
+                candidates.update(word_top)
+                exhaustive = False
+            else:
+                candidates.update((-scores[i], i) for i in self._live_ids(word))
+        top = heapq.nsmallest(self.TOP_K, candidates)
+        exhaustive = exhaustive and len(candidates) <= self.TOP_K
+
+        if end - start > self.RANGE_LIMIT:
+            self.prefix_top.pop(prefix, None)
+            self.prefix_top[prefix] = top
+            if len(self.prefix_top) > self.PREFIX_CACHE_SIZE:
+                del self.prefix_top[next(iter(self.prefix_top))]
+            exhaustive = False
+        return top, exhaustive
+
+    # CHANGES
+    def add_visits(self, visits):
+        """Fold (url, title, timestamp, count) visits in, as the history upsert does"""
+        for url, title, timestamp, count in visits:
+            entry_id = self.ids.get(url)
+            if entry_id is None:
+                entry_id = self._add_entry(url, title, frecency_add(None, timestamp, max(count, 1)))
+                self._rerank(entry_id, tokenize(url, title))
+                continue
+            history = self.history_scores[entry_id]
+            self.history_scores[entry_id] = frecency_add(None if math.isnan(history) else history, timestamp, count)
+            self.scores[entry_id] = self._score(entry_id)
+            if entry_id not in self.bookmark_scores:
+                self._set_title(entry_id, title)
+            self._rerank(entry_id, tokenize(url, self.titles[entry_id]))
+
+    def add_bookmarks(self, bookmarks):
+        """Add (url, title, created_at) bookmarks; URLs already bookmarked are left alone"""
+        for url, title, created_at in bookmarks:
+            entry_id = self.ids.get(url)
+            if entry_id is None:
+                entry_id = self._add_entry(url, title, None, self._bookmark_score(created_at))
+            elif entry_id in self.bookmark_scores:
+                continue
+            else:
+                self.bookmark_scores[entry_id] = self._bookmark_score(created_at)
+                self.scores[entry_id] = self._score(entry_id)
+                self._set_title(entry_id, title)
+            self._rerank(entry_id, tokenize(url, self.titles[entry_id]))
+
+    def rename_bookmark(self, url, title):
+        entry_id = self.ids.get(url)
+        if entry_id is not None:
+            self._set_title(entry_id, title)
+            self._rerank(entry_id, tokenize(url, self.titles[entry_id]))
+
+    def remove_bookmark(self, url):
+        entry_id = self.ids.get(url)
+        if entry_id is None or self.bookmark_scores.pop(entry_id, None) is None:
+            return
+        words = tokenize(url, self.titles[entry_id])
+        if math.isnan(self.history_scores[entry_id]):
+            # Bookmark only - the entry goes away entirely
+            self._unindex_words(entry_id, words)
+            del self.ids[url]
+            self.urls[entry_id] = self.titles[entry_id] = None
+        else:
+            self.scores[entry_id] = self._score(entry_id)
+            self._rerank(entry_id, words, raised=False)
+
+    def _set_title(self, entry_id, title):
+        title = title or self.urls[entry_id]
+        old = self.titles[entry_id]
+        if title == old:
+            return
+        url = self.urls[entry_id]
+        old_words, new_words = tokenize(url, old), tokenize(url, title)
+        self._unindex_words(entry_id, old_words - new_words)
+        self._index_words(entry_id, new_words - old_words)
+        self.titles[entry_id] = title
+
+    # QUERIES
+    def search(self, text, limit=10):
+        """Best (url, title, source) matches with a word starting with each typed word"""
+        return self.match(text, limit)[0]
+
+    def match(self, text, limit=10):
+        """search() results, plus whether they are every match there is"""
+        terms = sorted(set(TOKEN_PATTERN.findall(text.lower())), key=len, reverse=True)
+        if not terms:
+            return [], True
+        # The longest word narrows the most; the rest filter its top candidates
+        driver, others = terms[0], terms[1:]
+        candidates, exhaustive = self._candidates(driver)
+        results = []
+        for _, entry_id in candidates:
+            if others and not self._has_terms(entry_id, others):
+                continue
+            if len(results) >= limit:
+                return results, False
+            results.append(self._result(entry_id))
+        if exhaustive or not others:
+            return results, exhaustive
+        # Too few of the driver's top entries have the other words - intersect in full
+        matches = self._matching_ids(terms)
+        top = heapq.nsmallest(limit, ((-self.scores[i], i) for i in matches))
+        return [self._result(entry_id) for _, entry_id in top], len(matches) <= limit
+
+    def _result(self, entry_id):
+        return self.urls[entry_id], self.titles[entry_id], 'bookmark' if entry_id in self.bookmark_scores else 'history'
+
+    def _has_terms(self, entry_id, terms):
+        words = tokenize(self.urls[entry_id], self.titles[entry_id])
+        return all(any(word.startswith(term) for word in words) for term in terms)
+
+    def _prefix_words(self, prefix):
+        vocabulary = self.vocabulary
+        start = bisect_left(vocabulary, prefix)
+        return vocabulary[start:bisect_left(vocabulary, prefix + '\uffff', start)]
+
+    def _matching_ids(self, terms):
+        """Ids of every entry with a word starting with each term
+
+        Walks the postings of the term with the fewest, then checks the
+        others against that set: by their own postings while that is
+        cheaper, by the entries' words otherwise.
+        """
+        ranges = {term: self._prefix_words(term) for term in terms}
+        sizes = {term: sum(len(self.postings[word]) for word in words) for term, words in ranges.items()}
+        terms = sorted(terms, key=sizes.get)
+        matches = set()
+        for word in ranges[terms[0]]:
+            matches.update(self._live_ids(word))
+        for i, term in enumerate(terms[1:], 1):
+            if not matches:
+                break
+            if sizes[term] > len(matches) * self.POSTINGS_PER_CHECK:
+                rest = terms[i:]
+                return {entry_id for entry_id in matches if self._has_terms(entry_id, rest)}
+            found = set()
+            for word in ranges[term]:
+                found.update(self._live_ids(word))
+            matches &= found
+        return matches
+
+class Autocomplete:
+    """PrefixIndex kept in sync with a BrowserDatabase
+
+    The index is loaded on a background thread and then follows the
+    database through its change listener: visits and bookmark edits are
+    applied as they are committed, bulk deletes trigger a reload. search()
+    returns None until the index is ready, so callers can fall back to SQL.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.index = None
+        self._lock = threading.Lock()
+        self._backlog = []     # changes committed while a load is running
+        self._loading = False
+        self._reload = False
+        db.add_change_listener(self.on_change)
+
+    def start(self):
+        """Load the index in the background (again, if it is already loaded)"""
+        with self._lock:
+            if self._loading:
+                self._reload = True
+                return
+            self._loading = True
+            self.index = None
+        threading.Thread(target=self._load, name="AutocompleteLoader", daemon=True).start()
+
+    def _load(self):
+        while True:
+            started = time.perf_counter()
+            index = PrefixIndex()
+            try:
+                index.load(self.db.iter_history(), self.db.iter_bookmarks())
+            except Exception as e:
+                print(f"⚠️ Autocomplete index failed to load: {e}")
+                index = None
+            finally:
+                self.db.close()
+
+            with self._lock:
+                backlog, self._backlog = self._backlog, []
+                if not self._reload:
+                    if index is not None:
+                        for event, payload in backlog:
+                            self._apply(index, event, payload)
+                        print(f"⚡ Autocomplete index: {len(index):,} pages in {time.perf_counter() - started:.1f}s")
+                    self.index = index
+                    self._loading = False
+                    return
+                self._reload = False
+
+    def on_change(self, event, payload):
+        if event == 'reset':
+            self.start()
+            return
+        with self._lock:
+            if self._loading:
+                self._backlog.append((event, payload))
+            elif self.index is not None:
+                self._apply(self.index, event, payload)
+
+    @staticmethod
+    def _apply(index, event, payload):
+        if event == 'visits':
+            index.add_visits(payload)
+        elif event == 'bookmarks_added':
+            index.add_bookmarks(payload)
+        elif event == 'bookmark_renamed':
+            index.rename_bookmark(*payload)
+        elif event == 'bookmark_removed':
+            index.remove_bookmark(payload)
+
+    def search(self, text, limit=10):
+        """(url, title, source) suggestions, or None while the index is loading"""
+        found = self.match(text, limit)
+        return None if found is None else found[0]
+
+    def match(self, text, limit=10):
+        """(suggestions, complete) as PrefixIndex.match, or None while the index is loading"""
+        with self._lock:
+            if self.index is None:
+                return None
+            return self.index.match(text, limit)
+
+def matches_terms(terms, url, title):
+    """Whether every term starts some word of url or title (the FTS prefix-query rule)"""
+    words = TOKEN_PATTERN.findall(f"{url} {title or ''}".lower())
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+class NarrowingCache:
+    """Per-session suggestion results, refined locally as the query grows
+
+    Typing "git", "gith", "githu" only needs the backend once: every match
+    of a longer query is also a match of its prefix, so the prefix's ranked
+    rows are filtered instead. That is exact when the cached rows were the
+    complete match set, or when enough of them survive to fill the request
+    (anything uncached ranks below all cached rows). Each session keeps its
+    last max_queries queries; the least recently used of max_sessions
+    sessions is evicted. Call invalidate() on any history or bookmark
+    write.
+
+    backend(query, limit) returns (rows, complete) with rows starting
+    (url, title, ...), best first.
+    """
+
+    def __init__(self, backend, candidate_limit=PrefixIndex.TOP_K, max_sessions=64, max_queries=16):
+        self.backend = backend
+        self.candidate_limit = candidate_limit
+        self.max_sessions = max_sessions
+        self.max_queries = max_queries
+        self._sessions = OrderedDict()  # session -> OrderedDict(query -> (rows, complete))
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.backend_seconds = 0.0  # spent in the backend on misses
+        self.hit_seconds = 0.0      # spent filtering on hits
+
+    def lookup(self, session, query, limit=5):
+        """The best limit rows for query, from this session's cache when possible"""
+        started = time.perf_counter()
+        terms = TOKEN_PATTERN.findall(query.lower())
+        key = ' '.join(terms)
+        if not key:
+            # No words ("!!", "--"): '' would prefix every later key and narrow it to nothing
+            rows, complete = self.backend(query, self.candidate_limit)
+            return rows[:limit]
+        with self._lock:
+            queries = self._sessions.get(session)
+            if queries is None:
+                queries = self._sessions[session] = OrderedDict()
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session)
+            generation = self._generation
+            rows = self._narrow(queries, key, terms, limit)
+            if rows is not None:
+                self.hits += 1
+                self.hit_seconds += time.perf_counter() - started
+                return rows[:limit]
+
+        rows, complete = self.backend(query, self.candidate_limit)
+        with self._lock:
+            self.misses += 1
+            self.backend_seconds += time.perf_counter() - started
+            # A write landed while we were asking - the rows may already be stale
+            if generation == self._generation:
+                self._store(queries, key, rows, complete)
+        return rows[:limit]
+
+    def _narrow(self, queries, key, terms, limit):
+        if key in queries:
+            queries.move_to_end(key)
+            return queries[key][0]
+        # Longest cached query this one extends
+        base = max((cached for cached in queries if key.startswith(cached)), key=len, default=None)
+        if base is None:
+            return None
+        cached_rows, complete = queries[base]
+        rows = [row for row in cached_rows if matches_terms(terms, row[0], row[1])]
+        if not complete and len(rows) < limit:
+            return None
+        self._store(queries, key, rows, complete)
+        return rows
+
+    def _store(self, queries, key, rows, complete):
+        queries[key] = (rows, complete)
+        queries.move_to_end(key)
+        if len(queries) > self.max_queries:
+            queries.popitem(last=False)
+
+    def invalidate(self, *args):
+        """Forget every cached result (usable directly as a database change listener)"""
+        with self._lock:
+            self._sessions.clear()
+            self._generation += 1
+
+    def stats(self):
+        """Hit rate and the backend time hits avoided (at the average miss cost)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            miss_ms = self.backend_seconds * 1000 / self.misses if self.misses else 0.0
+            hit_ms = self.hit_seconds * 1000 / self.hits if self.hits else 0.0
+            return {
+                'lookups': lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'avg_miss_ms': round(miss_ms, 3),
+                'avg_hit_ms': round(hit_ms, 3),
+                'saved_ms': round(max(miss_ms - hit_ms, 0.0) * self.hits, 1),
+                'sessions': len(self._sessions),
+            }
@@ -0,0 +1,73 @@
+"""Build the autocomplete index over synthetic history and time keystroke-by-keystroke queries
+
+Usage: python benchmarks/autocomplete_benchmark.py [entries] [queries]
+"""
+import os
+import random
+import resource
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autocomplete import PrefixIndex
+from database import frecency_add
+
+TLDS = ['com', 'org', 'net', 'io', 'dev']
+
+def make_vocabulary(rng, size):
+    # Zipf-ish reuse: a few very common words, a long tail of rare ones
+    return [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(size)]
+
+def pick(rng, vocabulary):
+    return vocabulary[min(int(rng.paretovariate(0.4)) - 1, len(vocabulary) - 1)]
+
+def make_history(rng, count, vocabulary):
+    now = time.time()
+    for i in range(count):
+        host = f"{pick(rng, vocabulary)}.{rng.choice(TLDS)}"
+        path = '/'.join(pick(rng, vocabulary) for _ in range(rng.randint(0, 3)))
+        title = ' '.join(pick(rng, vocabulary) for _ in range(rng.randint(2, 6))).title()
+        frecency = frecency_add(None, now - rng.random() * 3e7, rng.randint(1, 20))
+        yield f"https://{host}/{path}?id={i}", title, frecency
+
+def percentile(samples, fraction):
+    return sorted(samples)[int(len(samples) * fraction)]
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = random.Random(7)
+    vocabulary = make_vocabulary(rng, 200_000)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    index = PrefixIndex()
+    index.load(make_history(rng, count, vocabulary), [])
+    print(f"Loaded {len(index):,} entries ({len(index.vocabulary):,} words) in {time.perf_counter() - started:.1f}s, "
+          f"peak RSS +{(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024:.0f} MB")
+
+    # Type each query one character at a time, as the URL bar does
+    latencies = []
+    for _ in range(query_count):
+        words = [pick(rng, vocabulary) for _ in range(rng.choice([1, 1, 1, 2]))]
+        text = ' '.join(words)
+        for end in range(1, len(text) + 1):
+            started = time.perf_counter()
+            index.search(text[:end], limit=10)
+            latencies.append(time.perf_counter() - started)
+    print(f"{len(latencies):,} keystroke queries: p50 {percentile(latencies, 0.5) * 1e6:.0f} µs, "
+          f"p99 {percentile(latencies, 0.99) * 1e6:.0f} µs, max {max(latencies) * 1e3:.1f} ms")
+
+    # Live updates as the history writer would deliver them
+    urls = index.urls
+    now = time.time()
+    started = time.perf_counter()
+    for i in range(10_000):
+        url = rng.choice(urls) if i % 2 else f"https://new{i}.example.com/"
+        index.add_visits([(url, f"Visited page {pick(rng, vocabulary)}", now + i, 1)])
+    print(f"10,000 incremental visits: {(time.perf_counter() - started) / 10_000 * 1e6:.0f} µs each")
+
+if __name__ == '__main__':
+    main()
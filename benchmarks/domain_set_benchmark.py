@@ -0,0 +1,80 @@
+"""Compare HostBlocklist (a Python set) with CompactDomainSet on a large hosts file
+
+Usage: python benchmarks/domain_set_benchmark.py [domains] [lookups]
+"""
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adblock import HostBlocklist, CompactDomainSet, build_domain_set, parse_hosts_file
+
+TLDS = ['com', 'net', 'org', 'io', 'co.uk', 'de', 'ru', 'info']
+
+def random_domain(rng):
+    labels = [''.join(rng.choices(string.ascii_lowercase + string.digits, k=rng.randint(4, 12)))
+              for _ in range(rng.randint(1, 3))]
+    return '.'.join(labels) + '.' + rng.choice(TLDS)
+
+def write_hosts_file(path, count, rng):
+    domains = [random_domain(rng) for _ in range(count)]
+    with open(path, 'w') as f:
+        f.write("# Generated blocklist\n127.0.0.1 localhost\n")
+        f.writelines(f"0.0.0.0 {domain}\n" for domain in domains)
+    return domains
+
+def measure(label, build):
+    """Time build(), then run it again under tracemalloc for its heap cost"""
+    started = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} {elapsed * 1000:8.1f} ms   heap {current / 1e6:7.2f} MB (peak {peak / 1e6:.2f} MB)")
+    return result
+
+def time_lookups(label, blocklist, hosts):
+    started = time.perf_counter()
+    hits = sum(1 for host in hosts if blocklist.matches(host))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {elapsed / len(hosts) * 1e6:8.2f} µs/lookup   ({hits:,} hits)")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as folder:
+        hosts_path = os.path.join(folder, 'blocklist.hosts')
+        domain_path = os.path.join(folder, 'hosts.domains')
+        domains = write_hosts_file(hosts_path, count, rng)
+        print(f"{count:,} domains, {os.path.getsize(hosts_path) / 1e6:.1f} MB hosts file\n")
+
+        def load_set():
+            with open(hosts_path) as f:
+                return HostBlocklist(parse_hosts_file(f))
+
+        def compile_compact():
+            with open(hosts_path) as f:
+                return build_domain_set(parse_hosts_file(f), domain_path)
+
+        hash_set = measure("set: load", load_set)
+        measure("compact: compile", compile_compact)
+        compact = measure("compact: map", lambda: CompactDomainSet(domain_path))
+        print(f"{'compact: file size':<24} {os.path.getsize(domain_path) / 1e6:8.2f} MB (page cache, shared)\n")
+
+        # Half listed subdomains, half misses, as page subresources would be
+        hosts = [f"cdn.{rng.choice(domains)}" if i % 2 else random_domain(rng) for i in range(lookups)]
+        time_lookups("set: match", hash_set, hosts)
+        time_lookups("compact: match", compact, hosts)
+        compact.close()
+
+if __name__ == '__main__':
+    main()
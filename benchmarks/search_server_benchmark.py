@@ -0,0 +1,109 @@
+"""Requests per second and tail latency of the local search server, per serving backend
+
+Each backend runs in its own process against the browser database; clients
+hold one connection each and reuse it whenever the server keeps it alive.
+
+Usage: python benchmarks/search_server_benchmark.py [clients] [seconds] [backend ...]
+"""
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# search_server.SERVER_BACKENDS, without importing the app (and its database) here
+BACKENDS = ('development', 'threaded', 'waitress')
+
+QUERIES = ['git', 'github', 'python', 'news', 'mail', 'docs', 'wiki', 'stack']
+
+def request_paths(rng):
+    query = rng.choice(QUERIES)
+    prefix = query[:rng.randint(1, len(query))]
+    return {
+        '/': '/',
+        '/search': f'/search?q={query}',
+        '/suggest': f'/suggest?q={prefix}&session=bench{rng.randint(0, 9)}',
+    }
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(backend, port):
+    code = f"import search_server; search_server.serve('127.0.0.1', {port}, {backend!r})"
+    server = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"{backend} server did not start")
+
+def client(port, endpoint, stop, latencies, seed):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            connection.request('GET', request_paths(rng)[endpoint])
+            connection.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+def percentile(samples, fraction):
+    return sorted(samples)[min(int(len(samples) * fraction), len(samples) - 1)]
+
+def run(port, endpoint, clients, seconds):
+    stop = threading.Event()
+    latencies = []
+    threads = [threading.Thread(target=client, args=(port, endpoint, stop, latencies, i)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    backends = sys.argv[3:] or BACKENDS
+
+    for backend in backends:
+        if backend not in BACKENDS:
+            print(f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+            continue
+        port = free_port()
+        server = start_server(backend, port)
+        try:
+            # Let the autocomplete index finish loading so /suggest is measured warm
+            run(port, '/suggest', 1, 2)
+            for endpoint in ('/', '/search', '/suggest'):
+                latencies = run(port, endpoint, clients, seconds)
+                if not latencies:
+                    print(f"{backend:>11} {endpoint:<8} no successful requests")
+                    continue
+                print(f"{backend:>11} {endpoint:<8} {len(latencies) / seconds:8.0f} req/s  "
+                      f"p50 {percentile(latencies, 0.5) * 1e3:6.2f} ms  "
+                      f"p99 {percentile(latencies, 0.99) * 1e3:6.2f} ms  "
+                      f"max {max(latencies) * 1e3:7.2f} ms")
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == '__main__':
+    main()
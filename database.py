@@ -1,7 +1,15 @@
 import sqlite3
 import time
+import math
+import json
 import os
+import queue
+import re
 import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from import_export import export_format, write_export
 
 def get_database_path():
     """Get database path - robust for both development and bundled"""
@@ -14,151 +22,625 @@ def get_database_path():
     
     return os.path.join(base_path, 'browser_data.db')
 
-class BrowserDatabase:
-    def __init__(self, db_name=None):
-        if db_name is None:
-            self.db_path = get_database_path()
-        else:
-            self.db_path = db_name
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.create_tables()
-        self.conn.commit()
-
-    def create_tables(self):
-        """Create all database tables"""
-        # History table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                url TEXT NOT NULL,
-                title TEXT,
-                timestamp REAL,
-                visit_count INTEGER DEFAULT 1
+# Bumped whenever the saved session layout changes
+SESSION_VERSION = 1
+
+# FRECENCY
+# Every visit adds weight * 2^((visited_at - EPOCH) / HALF_LIFE) to a URL's score.
+# The score is stored as log2 of that sum, so it can be updated one visit at a
+# time and compared across URLs without ever decaying stored values: a visit
+# HALF_LIFE seconds older is worth half as much, whenever the query runs.
+FRECENCY_EPOCH = 1577836800  # 2020-01-01
+FRECENCY_HALF_LIFE = 30 * 24 * 3600
+
+def frecency_add(score, timestamp, weight):
+    """Fold weight visits at timestamp into a stored frecency score (None = no visits yet)"""
+    if weight <= 0:
+        return score
+    visit = (timestamp - FRECENCY_EPOCH) / FRECENCY_HALF_LIFE + math.log2(weight)
+    if score is None:
+        return visit
+    high, low = max(score, visit), min(score, visit)
+    return high + math.log2(1 + 2 ** (low - high))
+
+# SCHEMA MIGRATIONS
+# Each step upgrades the schema by one version; PRAGMA user_version records how
+# many steps a database has seen. Steps must also cope with databases created
+# before versioning existed (user_version 0 with some tables already present).
+
+def _create_base_tables(cursor):
+    """Create all database tables"""
+    # History table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            title TEXT,
+            timestamp REAL,
+            visit_count INTEGER DEFAULT 1
+        )
+    """)
+
+    # Bookmarks table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bookmarks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            created_at REAL
+        )
+    """)
+
+    # Downloads table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS downloads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            path TEXT NOT NULL,
+            downloaded_at REAL,
+            size_bytes INTEGER
+        )
+    """)
+
+    # Settings table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+def _add_bookmark_created_at(cursor):
+    """Add created_at to bookmarks tables that predate it"""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(bookmarks)")]
+    if 'created_at' not in columns:
+        cursor.execute("ALTER TABLE bookmarks ADD COLUMN created_at REAL")
+        print("✅ Added created_at column to bookmarks table")
+
+def _create_history_indexes(cursor):
+    """Create lookup and ordering indexes"""
+    # Fold duplicate history rows into the most recent one before enforcing uniqueness
+    # (a bare column next to MAX() comes from the row holding the maximum)
+    cursor.execute("""
+        CREATE TEMP TABLE history_keep (id INTEGER PRIMARY KEY, url TEXT, timestamp REAL, visit_count INTEGER)
+    """)
+    cursor.execute("""
+        INSERT INTO history_keep
+        SELECT id, url, MAX(timestamp), SUM(visit_count)
+        FROM history GROUP BY url HAVING COUNT(*) > 1
+    """)
+    cursor.execute("""
+        UPDATE history
+        SET visit_count = (SELECT k.visit_count FROM history_keep AS k WHERE k.id = history.id)
+        WHERE id IN (SELECT id FROM history_keep)
+    """)
+    cursor.execute("""
+        DELETE FROM history
+        WHERE url IN (SELECT url FROM history_keep) AND id NOT IN (SELECT id FROM history_keep)
+    """)
+    if cursor.rowcount > 0:
+        print(f"✅ Merged {cursor.rowcount} duplicate history rows")
+    cursor.execute("DROP TABLE temp.history_keep")
+
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_history_url ON history(url)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookmarks_title ON bookmarks(title)")
+
+def _create_search_index(cursor):
+    """Create FTS5 indexes over history and bookmarks (if SQLite supports it)"""
+    if not _fts5_available(cursor):
+        print("⚠️ SQLite has no FTS5 - falling back to LIKE search")
+        return
+
+    for table in ('history', 'bookmarks'):
+        fts_table = f"{table}_fts"
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,))
+        needs_backfill = cursor.fetchone() is None
+
+        # External content table - the FTS index stores only tokens, rows live in the base table
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                url, title, content='{table}', content_rowid='id', prefix='2 3'
             )
         """)
-        
-        # Bookmarks table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bookmarks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                url TEXT NOT NULL UNIQUE,
-                title TEXT NOT NULL,
-                created_at REAL
-            )
+
+        # Keep the index in sync with the base table
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts_table} (rowid, url, title) VALUES (new.id, new.url, new.title);
+            END
         """)
-        
-        # MIGRATION: Add created_at column if it doesn't exist
-        try:
-            self.cursor.execute("ALTER TABLE bookmarks ADD COLUMN created_at REAL")
-            print("✅ Added created_at column to bookmarks table")
-        except sqlite3.OperationalError:
-            print("✅ created_at column already exists")
-        
-        self.conn.commit()
-        
-        # Downloads table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS downloads (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL,
-                path TEXT NOT NULL,
-                downloaded_at REAL,
-                size_bytes INTEGER
-            )
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts_table} ({fts_table}, rowid, url, title) VALUES ('delete', old.id, old.url, old.title);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF url, title ON {table}
+            WHEN old.url IS NOT new.url OR old.title IS NOT new.title BEGIN
+                INSERT INTO {fts_table} ({fts_table}, rowid, url, title) VALUES ('delete', old.id, old.url, old.title);
+                INSERT INTO {fts_table} (rowid, url, title) VALUES (new.id, new.url, new.title);
+            END
         """)
-        
-        # Settings table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
+
+        # Index rows that existed before the FTS table
+        if needs_backfill:
+            cursor.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+            print(f"✅ Built full-text index for {table}")
+
+def _fts5_available(cursor):
+    """Check whether this SQLite build ships the FTS5 extension"""
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        cursor.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def _create_visits(cursor):
+    """Add the per-visit log and a precomputed frecency score per URL"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS visits (
+            id INTEGER PRIMARY KEY,
+            history_id INTEGER NOT NULL REFERENCES history(id),
+            visited_at REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_visits_history ON visits(history_id, visited_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_visits_visited_at ON visits(visited_at)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS history_visits_ad AFTER DELETE ON history BEGIN
+            DELETE FROM visits WHERE history_id = old.id;
+        END
+    """)
+
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(history)")]
+    if 'frecency' not in columns:
+        cursor.execute("ALTER TABLE history ADD COLUMN frecency REAL NOT NULL DEFAULT 0")
+
+    # Older rows only remember their last visit - seed one visit and the score from that
+    cursor.execute("""
+        INSERT INTO visits (history_id, visited_at)
+        SELECT id, timestamp FROM history
+        WHERE timestamp IS NOT NULL AND id NOT IN (SELECT history_id FROM visits)
+    """)
+    cursor.execute("""
+        UPDATE history SET frecency = frecency_add(NULL, COALESCE(timestamp, 0), MAX(visit_count, 1))
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_frecency ON history(frecency)")
+
+def _create_trigram_index(cursor):
+    """Index title/url trigrams for typo-tolerant search (needs SQLite 3.34+ trigram tokenizer)"""
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(x, tokenize='trigram')")
+        cursor.execute("DROP TABLE temp.trigram_probe")
+    except sqlite3.OperationalError:
+        print("⚠️ SQLite has no trigram tokenizer - fuzzy search disabled")
+        return
+
+    for table in ('history', 'bookmarks'):
+        trigram_table = f"{table}_trigram"
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {trigram_table} USING fts5(
+                url, title, content='{table}', content_rowid='id', tokenize='trigram', detail='none'
             )
         """)
-        
-        self.conn.commit()
+        # Per-trigram document counts, used to skip trigrams that match almost everything
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {trigram_table}_vocab USING fts5vocab({trigram_table}, 'row')
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {trigram_table}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {trigram_table} (rowid, url, title) VALUES (new.id, new.url, new.title);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {trigram_table}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {trigram_table} ({trigram_table}, rowid, url, title) VALUES ('delete', old.id, old.url, old.title);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {trigram_table}_au AFTER UPDATE OF url, title ON {table}
+            WHEN old.url IS NOT new.url OR old.title IS NOT new.title BEGIN
+                INSERT INTO {trigram_table} ({trigram_table}, rowid, url, title) VALUES ('delete', old.id, old.url, old.title);
+                INSERT INTO {trigram_table} (rowid, url, title) VALUES (new.id, new.url, new.title);
+            END
+        """)
+        cursor.execute(f"INSERT INTO {trigram_table} ({trigram_table}) VALUES ('rebuild')")
+
+def _add_download_state(cursor):
+    """Track source URL, state and byte progress for each download"""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(downloads)")]
+    for column, definition in (
+        ('url', "TEXT"),
+        # Rows written before states existed were finished downloads
+        ('state', "TEXT NOT NULL DEFAULT 'Completed'"),
+        ('bytes_received', "INTEGER NOT NULL DEFAULT 0"),
+        ('started_at', "REAL"),
+        ('updated_at', "REAL"),
+    ):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE downloads ADD COLUMN {column} {definition}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_downloads_state ON downloads(state)")
+
+def _create_blocked_domains(cursor):
+    """Aggregate ad-block hits per domain (totals only, no per-request rows)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS blocked_domains (
+            domain TEXT PRIMARY KEY,
+            blocked_count INTEGER NOT NULL DEFAULT 0,
+            bytes_saved INTEGER NOT NULL DEFAULT 0,
+            last_blocked REAL
+        )
+    ''')
+
+# Append new steps to the end - never reorder or edit a released step
+MIGRATIONS = [
+    _create_base_tables,
+    _add_bookmark_created_at,
+    _create_history_indexes,
+    _create_search_index,
+    _create_visits,
+    _create_trigram_index,
+    _add_download_state,
+    _create_blocked_domains,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(conn):
+    """Apply pending schema migrations, once, under an exclusive lock"""
+    # Fast path: an up-to-date database costs a single pragma read
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    conn.execute("BEGIN EXCLUSIVE")
+    try:
+        # Another process may have migrated while we waited for the lock
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        cursor = conn.cursor()
+        for step in MIGRATIONS[version:]:
+            step(cursor)
+        if version < SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            print(f"✅ Database schema migrated from v{version} to v{SCHEMA_VERSION}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+# FUZZY MATCHING
+
+def trigrams(text, padded=True):
+    """Set of lowercase word trigrams; padded ones mark word starts/ends like pg_trgm"""
+    grams = set()
+    for word in re.findall(r'[^\W_]+', text.lower()):
+        if padded:
+            word = f"  {word} "
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+def trigram_similarity(query_grams, text):
+    """Share of the query's trigrams that also occur in text"""
+    if not query_grams or not text:
+        return 0.0
+    return len(query_grams & trigrams(text)) / len(query_grams)
+
+class ConnectionPool:
+    """Shared SQLite connections for one database file
+
+    The database runs in WAL mode so readers never wait on the writer. Each
+    thread gets its own read-only connection; all writes go through a single
+    connection serialized by a lock. Schema setup runs once, when the pool
+    for a path is first created.
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db_path, setup=None):
+        """Return the pool for db_path, creating it (and running setup) on first use"""
+        key = os.path.abspath(db_path) if db_path != ':memory:' else db_path
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls(db_path)
+                if setup is not None:
+                    with pool._write_lock:
+                        setup(pool._writer)
+                pool.has_fts = pool._table_exists('history_fts')
+                pool.has_trigram = pool._table_exists('history_trigram')
+                cls._pools[key] = pool
+            return pool
+
+    @classmethod
+    def close_all(cls):
+        """Close every pool (call once at application exit)"""
+        with cls._pools_lock:
+            for pool in cls._pools.values():
+                pool.close()
+            cls._pools.clear()
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.has_fts = False
+        self.has_trigram = False
+        self.listeners = []  # called as listener(event, payload) after each committed change
+        self._local = threading.local()
+        self._readers = []  # (thread, connection) pairs, pruned as threads exit
+        self._readers_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode = WAL")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.create_function('frecency_add', 3, frecency_add, deterministic=True)
+        return conn
+
+    def reader(self):
+        """Read-only connection owned by the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._readers_lock:
+                # Request threads come and go - close connections left behind by dead ones
+                for thread, old in self._readers:
+                    if not thread.is_alive():
+                        old.close()
+                self._readers = [(t, c) for t, c in self._readers if t.is_alive()]
+                self._readers.append((threading.current_thread(), conn))
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Exclusive access to the writer connection; commits on success, rolls back on error"""
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    def release_reader(self):
+        """Close the calling thread's reader connection (reopened on next use)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            with self._readers_lock:
+                self._readers = [(t, c) for t, c in self._readers if c is not conn]
+            conn.close()
+
+    def close(self):
+        with self._readers_lock:
+            for _, conn in self._readers:
+                conn.close()
+            self._readers = []
+        with self._write_lock:
+            self._writer.close()
+
+    def _table_exists(self, name):
+        row = self.reader().execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+        return row is not None
+
+class BrowserDatabase:
+    # New URLs always count as one visit; merged repeat visits may add zero
+    HISTORY_UPSERT = """
+        INSERT INTO history (url, title, timestamp, visit_count, frecency)
+        VALUES (:url, :title, :timestamp, MAX(:count, 1), frecency_add(NULL, :timestamp, MAX(:count, 1)))
+        ON CONFLICT(url) DO UPDATE SET
+            title = excluded.title,
+            timestamp = excluded.timestamp,
+            visit_count = visit_count + :count,
+            frecency = frecency_add(frecency, excluded.timestamp, :count)
+    """
+    VISIT_INSERT = """
+        INSERT INTO visits (history_id, visited_at)
+        SELECT id, :timestamp FROM history WHERE url = :url
+    """
+
+    def __init__(self, db_name=None):
+        if db_name is None:
+            self.db_path = get_database_path()
+        else:
+            self.db_path = db_name
+        self.pool = ConnectionPool.get(self.db_path, setup=migrate)
+
+    @property
+    def has_fts(self):
+        return self.pool.has_fts
+
+    def _query(self, sql, params=()):
+        """Run a read query on this thread's reader connection"""
+        return self.pool.reader().execute(sql, params).fetchall()
+
+    def _iter_query(self, sql, params=(), batch_size=10000):
+        """Stream a read query's rows without materializing the whole result"""
+        cursor = self.pool.reader().execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def add_change_listener(self, listener):
+        """Call listener(event, payload) after every committed write to this database file
+
+        Listeners are shared by every BrowserDatabase on the same file and run
+        on the writing thread. Events: 'visits' [(url, title, timestamp, count)],
+        'bookmarks_added' [(url, title, created_at)], 'bookmark_renamed'
+        (url, title), 'bookmark_removed' url, and 'reset' None after bulk
+        deletes.
+        """
+        self.pool.listeners.append(listener)
+
+    def remove_change_listener(self, listener):
+        if listener in self.pool.listeners:
+            self.pool.listeners.remove(listener)
+
+    def _notify(self, event, payload=None):
+        for listener in list(self.pool.listeners):
+            try:
+                listener(event, payload)
+            except Exception as e:
+                print(f"⚠️ Change listener failed on {event}: {e}")
+
+    @staticmethod
+    def _fts_query(text):
+        """Turn free text into an FTS5 query matching every word as a prefix"""
+        # Same word boundaries as the unicode61 tokenizer (underscore is a separator)
+        words = re.findall(r'[^\W_]+', text.lower())
+        return ' '.join(f'"{word}"*' for word in words)
 
     def add_history_entry(self, url, title):
         """Add or update history entry"""
-        timestamp = time.time()
-        # Check if URL already exists
-        self.cursor.execute("SELECT visit_count FROM history WHERE url = ?", (url,))
-        result = self.cursor.fetchone()
-        
-        if result:
-            # Update existing entry
-            new_count = result[0] + 1
-            self.cursor.execute("""
-                UPDATE history 
-                SET title = ?, timestamp = ?, visit_count = ? 
-                WHERE url = ?
-            """, (title, timestamp, new_count, url))
-        else:
-            # Add new entry
-            self.cursor.execute("""
-                INSERT INTO history (url, title, timestamp, visit_count) 
-                VALUES (?, ?, ?, ?)
-            """, (url, title, timestamp, 1))
-        
-        self.conn.commit()
+        self.add_history_entries([(url, title, time.time(), 1)])
+
+    def add_history_entries(self, visits):
+        """Record a batch of (url, title, timestamp, visit_count) visits in one transaction"""
+        rows = [
+            {'url': url, 'title': title, 'timestamp': timestamp, 'count': visit_count}
+            for url, title, timestamp, visit_count in visits
+        ]
+        with self.pool.writer() as conn:
+            conn.executemany(self.HISTORY_UPSERT, rows)
+            # One visits row per counted visit (new URLs always get one)
+            conn.executemany(self.VISIT_INSERT, (
+                row for row in rows for _ in range(max(row['count'], 1))
+            ))
+        self._notify('visits', visits)
+
+    def iter_history(self):
+        """Every history entry as (url, title, frecency), streamed"""
+        return self._iter_query("SELECT url, title, frecency FROM history")
 
     def get_history(self, limit=50):
         """Get recent history"""
-        self.cursor.execute("""
+        return self._query("""
             SELECT url, title, timestamp 
             FROM history 
             ORDER BY timestamp DESC 
             LIMIT ?
         """, (limit,))
-        return self.cursor.fetchall()
     
+    def get_top_sites(self, limit=8):
+        """Get the most frecent pages"""
+        return self._query("""
+            SELECT url, title
+            FROM history
+            ORDER BY frecency DESC
+            LIMIT ?
+        """, (limit,))
+
     def search_history(self, query, limit=50):
-        """Search history by query"""
-        self.cursor.execute("""
+        """Search history by query (relevance blended with frecency)"""
+        fts_query = self._fts_query(query)
+        if self.has_fts and fts_query:
+            return self._query("""
+                SELECT h.url, h.title, h.timestamp
+                FROM history_fts
+                JOIN history h ON h.id = history_fts.rowid
+                WHERE history_fts MATCH ?
+                -- bm25 is lower-is-better; one unit of relevance trades for one frecency half-life
+                ORDER BY bm25(history_fts, 1.0, 2.0) - h.frecency
+                LIMIT ?
+            """, (fts_query, limit))
+
+        return self._query("""
             SELECT url, title, timestamp 
             FROM history 
             WHERE LOWER(title) LIKE ? OR LOWER(url) LIKE ?
-            ORDER BY timestamp DESC 
+            ORDER BY frecency DESC 
             LIMIT ?
         """, (f'%{query.lower()}%', f'%{query.lower()}%', limit))
-        return self.cursor.fetchall()
 
     def add_bookmark(self, url, title):
         """Add bookmark (ignores duplicates)"""
+        created_at = time.time()
         try:
-            self.cursor.execute("""
-                INSERT INTO bookmarks (url, title, created_at) 
-                VALUES (?, ?, ?)
-            """, (url, title, time.time()))
-            self.conn.commit()
-            return True
+            with self.pool.writer() as conn:
+                conn.execute("""
+                    INSERT INTO bookmarks (url, title, created_at) 
+                    VALUES (?, ?, ?)
+                """, (url, title, created_at))
         except sqlite3.IntegrityError:
             return False
+        self._notify('bookmarks_added', [(url, title, created_at)])
+        return True
+
+    def add_bookmarks_bulk(self, bookmarks):
+        """Insert (url, title, created_at) rows in one transaction, skipping known URLs
+
+        Rows are staged in a temp table and moved with a single INSERT ... SELECT:
+        the full-text triggers are far cheaper once per statement than once per
+        executemany row. Returns how many rows were actually inserted.
+        """
+        now = time.time()
+        bookmarks = [(url, title, created_at or now) for url, title, created_at in bookmarks]
+        with self.pool.writer() as conn:
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS bookmark_import (
+                    url TEXT, title TEXT, created_at REAL
+                )
+            """)
+            try:
+                conn.executemany("INSERT INTO bookmark_import VALUES (?, ?, ?)", bookmarks)
+                cursor = conn.execute("""
+                    INSERT OR IGNORE INTO bookmarks (url, title, created_at)
+                    SELECT url, title, created_at FROM bookmark_import ORDER BY rowid
+                """)
+                inserted = cursor.rowcount
+            finally:
+                conn.execute("DELETE FROM bookmark_import")
+        # URLs that were already bookmarked keep their stored title; listeners skip them too
+        self._notify('bookmarks_added', bookmarks)
+        return inserted
 
     def get_bookmarks(self):
         """Get all bookmarks"""
-        self.cursor.execute("SELECT url, title FROM bookmarks ORDER BY title ASC")
-        return self.cursor.fetchall()
+        return self._query("SELECT url, title FROM bookmarks ORDER BY title ASC")
+
+    def iter_bookmarks(self):
+        """Every bookmark as (url, title, created_at), streamed"""
+        return self._iter_query("SELECT url, title, created_at FROM bookmarks")
     
-    def search_bookmarks(self, query):
-        """Search bookmarks by query"""
-        self.cursor.execute("""
+    def search_bookmarks(self, query, limit=-1):
+        """Search bookmarks by query (limit -1 returns every match)"""
+        fts_query = self._fts_query(query)
+        if self.has_fts and fts_query:
+            return self._query("""
+                SELECT b.url, b.title
+                FROM bookmarks_fts
+                JOIN bookmarks b ON b.id = bookmarks_fts.rowid
+                WHERE bookmarks_fts MATCH ?
+                ORDER BY bm25(bookmarks_fts, 1.0, 2.0), b.title ASC
+                LIMIT ?
+            """, (fts_query, limit))
+
+        return self._query("""
             SELECT url, title 
             FROM bookmarks 
             WHERE LOWER(title) LIKE ? OR LOWER(url) LIKE ?
             ORDER BY title ASC
-        """, (f'%{query.lower()}%', f'%{query.lower()}%'))
-        return self.cursor.fetchall()
+            LIMIT ?
+        """, (f'%{query.lower()}%', f'%{query.lower()}%', limit))
     
     def update_bookmark(self, url, new_title):
         """Update bookmark title"""
-        self.cursor.execute("UPDATE bookmarks SET title = ? WHERE url = ?", (new_title, url))
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute("UPDATE bookmarks SET title = ? WHERE url = ?", (new_title, url))
+        self._notify('bookmark_renamed', (url, new_title))
     
     def delete_bookmark(self, url):
         """Delete bookmark by URL"""
-        self.cursor.execute("DELETE FROM bookmarks WHERE url = ?", (url,))
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM bookmarks WHERE url = ?", (url,))
+        self._notify('bookmark_removed', url)
     
     def remove_bookmark(self, url):
         """Remove bookmark by URL (alias for delete_bookmark)"""
@@ -166,34 +648,479 @@ class BrowserDatabase:
 
     def get_bookmark_count(self):
         """Get bookmark count"""
-        self.cursor.execute("SELECT COUNT(*) FROM bookmarks")
-        return self.cursor.fetchone()[0]
+        return self._query("SELECT COUNT(*) FROM bookmarks")[0][0]
+
+    def clear_bookmarks(self):
+        """Delete all bookmarks"""
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM bookmarks")
+        self._notify('reset')
 
     def clear_history(self):
         """Clear all history"""
-        self.cursor.execute("DELETE FROM history")
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM visits")
+            conn.execute("DELETE FROM history")
+        self._notify('reset')
+
+    def count_history_range(self, since=None, until=None):
+        """Count history entries last visited in [since, until)"""
+        where, params = self._time_range('timestamp', since, until)
+        return self._query(f"SELECT COUNT(*) FROM history WHERE {where}", params)[0][0]
+
+    def delete_history_range(self, since=None, until=None, chunk_size=2000, progress=None):
+        """Delete the visits made in [since, until) in bounded chunks
+
+        URLs left without visits are removed; the others get their last
+        visit, visit count and frecency recomputed from the visits they keep.
+        Each chunk is its own short write transaction, so the history writer
+        can interleave its commits. progress(visits_deleted, total) is called
+        after every chunk; returning False from it stops early. Returns the
+        number of history entries removed.
+        """
+        where, params = self._time_range('visited_at', since, until)
+        total = self._query(f"SELECT COUNT(*) FROM visits WHERE {where}", params)[0][0]
+        deleted = removed = 0
+        while True:
+            with self.pool.writer() as conn:
+                chunk = conn.execute(f"SELECT id, history_id FROM visits WHERE {where} LIMIT ?", (*params, chunk_size)).fetchall()
+                if chunk:
+                    conn.executemany("DELETE FROM visits WHERE id = ?", ((visit_id,) for visit_id, _ in chunk))
+                    removed += self._recount_history(conn, Counter(history_id for _, history_id in chunk))
+            if not chunk:
+                break
+            deleted += len(chunk)
+            if progress and progress(deleted, total) is False:
+                break
+            time.sleep(0.005)  # let waiting writers take the lock
+        if deleted:
+            self._notify('reset')
+        return removed
+
+    @staticmethod
+    def _recount_history(conn, deleted_visits):
+        """Refresh history rows after {history_id: visits deleted}; returns how many were removed"""
+        removed = 0
+        for history_id, deleted in deleted_visits.items():
+            row = conn.execute("SELECT visit_count FROM history WHERE id = ?", (history_id,)).fetchone()
+            if row is None:
+                continue
+            visited = [visited_at for visited_at, in conn.execute(
+                "SELECT visited_at FROM visits WHERE history_id = ? ORDER BY visited_at", (history_id,)
+            )]
+            if not visited:
+                conn.execute("DELETE FROM history WHERE id = ?", (history_id,))
+                removed += 1
+                continue
+            # Rows older than the visit log kept their earlier visits as one seeded visit
+            visit_count = max(row[0] - deleted, len(visited))
+            frecency = frecency_add(None, visited[0], visit_count - len(visited) + 1)
+            for visited_at in visited[1:]:
+                frecency = frecency_add(frecency, visited_at, 1)
+            conn.execute(
+                "UPDATE history SET timestamp = ?, visit_count = ?, frecency = ? WHERE id = ?",
+                (visited[-1], visit_count, frecency, history_id)
+            )
+        return removed
+
+    @staticmethod
+    def _time_range(column, since, until):
+        """WHERE clause for an indexed [since, until) range (None = unbounded)"""
+        conditions, params = [], []
+        if since is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append(f"{column} < ?")
+            params.append(until)
+        return ' AND '.join(conditions) or '1', tuple(params)
+
+    def export_bookmarks(self, path, batch_size=1000, progress=None):
+        """Stream all bookmarks to path as Netscape HTML, JSON Lines or CSV (by extension)"""
+        return self._export(path, 'bookmarks', "Bookmarks", """
+            SELECT url, title, created_at FROM bookmarks ORDER BY id
+        """, ('url', 'title', 'created_at'), batch_size, progress)
+
+    def export_history(self, path, batch_size=1000, progress=None):
+        """Stream all history, newest first, to path as Netscape HTML, JSON Lines or CSV"""
+        return self._export(path, 'history', "History", """
+            SELECT url, title, timestamp, visit_count FROM history ORDER BY timestamp DESC
+        """, ('url', 'title', 'timestamp', 'visit_count'), batch_size, progress)
+
+    def _export(self, path, table, title, sql, columns, batch_size, progress):
+        """Write a query batch by batch with fetchmany, then move the file into place
+
+        Only one batch is ever held in memory. progress(done, total) returning
+        False abandons the export and leaves any existing file untouched.
+        Returns the number of rows written.
+        """
+        reader = self.pool.reader()
+        total = reader.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        cursor = reader.execute(sql)
+        batches = iter(lambda: cursor.fetchmany(batch_size), [])
+        cancelled = False
+
+        def on_batch(done):
+            nonlocal cancelled
+            cancelled = progress is not None and progress(done, total) is False
+            return not cancelled
+
+        temp_path = path + '.part'
+        try:
+            with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+                written = write_export(f, export_format(path), columns, batches, title, on_batch)
+            if cancelled:
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            cursor.close()
+        return written
+
+    # DOWNLOADS
+    # States mirror QWebEngineDownloadRequest: Downloading, Completed, Cancelled, Interrupted
+    DOWNLOAD_COLUMNS = "id, url, filename, path, state, bytes_received, size_bytes, started_at, downloaded_at"
+
+    def add_download(self, url, filename, path, size_bytes=None):
+        """Record a new in-progress download and return its id"""
+        now = time.time()
+        with self.pool.writer() as conn:
+            cursor = conn.execute("""
+                INSERT INTO downloads (url, filename, path, state, size_bytes, started_at, updated_at)
+                VALUES (?, ?, ?, 'Downloading', ?, ?, ?)
+            """, (url, filename, path, size_bytes, now, now))
+            return cursor.lastrowid
+
+    def update_downloads(self, updates):
+        """Write a batch of (id, state, bytes_received, size_bytes) progress rows in one transaction"""
+        now = time.time()
+        with self.pool.writer() as conn:
+            conn.executemany("""
+                UPDATE downloads
+                SET state = ?, bytes_received = ?, size_bytes = ?, updated_at = ?,
+                    downloaded_at = CASE WHEN ? = 'Completed' THEN ? ELSE downloaded_at END
+                WHERE id = ?
+            """, [
+                (state, received, total, now, state, now, download_id)
+                for download_id, state, received, total in updates
+            ])
+
+    def get_downloads(self, limit=50, before_id=None):
+        """Get a page of downloads, newest first (pass the last id seen as before_id for the next page)"""
+        if before_id is None:
+            return self._query(f"""
+                SELECT {self.DOWNLOAD_COLUMNS} FROM downloads ORDER BY id DESC LIMIT ?
+            """, (limit,))
+        return self._query(f"""
+            SELECT {self.DOWNLOAD_COLUMNS} FROM downloads WHERE id < ? ORDER BY id DESC LIMIT ?
+        """, (before_id, limit))
+
+    def get_download_count(self):
+        """Count recorded downloads"""
+        return self._query("SELECT COUNT(*) FROM downloads")[0][0]
+
+    def interrupt_stale_downloads(self):
+        """Mark downloads left in progress by a previous run as Interrupted"""
+        with self.pool.writer() as conn:
+            cursor = conn.execute("""
+                UPDATE downloads SET state = 'Interrupted', updated_at = ? WHERE state = 'Downloading'
+            """, (time.time(),))
+            return cursor.rowcount
+
+    def clear_finished_downloads(self):
+        """Forget completed, cancelled and interrupted downloads (files stay on disk)"""
+        with self.pool.writer() as conn:
+            cursor = conn.execute("DELETE FROM downloads WHERE state != 'Downloading'")
+            return cursor.rowcount
+
+    def record_blocked_domains(self, counts):
+        """Add a batch of (domain, blocked_count, bytes_saved) to the running totals"""
+        now = time.time()
+        with self.pool.writer() as conn:
+            conn.executemany("""
+                INSERT INTO blocked_domains (domain, blocked_count, bytes_saved, last_blocked)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(domain) DO UPDATE SET
+                    blocked_count = blocked_count + excluded.blocked_count,
+                    bytes_saved = bytes_saved + excluded.bytes_saved,
+                    last_blocked = excluded.last_blocked
+            """, [(domain, count, size, now) for domain, count, size in counts])
+
+    def get_top_blocked_domains(self, limit=10):
+        """Most frequently blocked domains as (domain, blocked_count, bytes_saved)"""
+        return self._query("""
+            SELECT domain, blocked_count, bytes_saved FROM blocked_domains
+            ORDER BY blocked_count DESC LIMIT ?
+        """, (limit,))
 
     def clear_all_data(self):
         """Nuclear option - clear everything"""
-        self.cursor.execute("DELETE FROM history")
-        self.cursor.execute("DELETE FROM bookmarks")
-        self.cursor.execute("DELETE FROM downloads")
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM visits")
+            conn.execute("DELETE FROM history")
+            conn.execute("DELETE FROM bookmarks")
+            conn.execute("DELETE FROM downloads")
+            conn.execute("DELETE FROM blocked_domains")
+        self._notify('reset')
+
+    def get_setting(self, key, default=None):
+        """Read a value from the settings table"""
+        rows = self._query("SELECT value FROM settings WHERE key = ?", (key,))
+        return rows[0][0] if rows else default
+
+    def set_setting(self, key, value):
+        """Store a value in the settings table"""
+        with self.pool.writer() as conn:
+            conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+    def get_session(self):
+        """Read the saved session as {'windows': [{'active': i, 'tabs': [{'url', 'title', 'pinned'}]}]}"""
+        value = self.get_setting('session')
+        if not value:
+            return None
+        try:
+            session = json.loads(value)
+        except ValueError:
+            # Sessions saved before the structured format: comma-joined URLs of one window
+            tabs = [{'url': url.strip(), 'title': '', 'pinned': False} for url in value.split(',') if url.strip()]
+            return {'version': SESSION_VERSION, 'windows': [{'active': 0, 'tabs': tabs}]}
+        return session if isinstance(session, dict) else None
+
+    def save_session(self, session):
+        """Replace the saved session in a single (atomic) settings write"""
+        self.set_setting('session', json.dumps(session, separators=(',', ':'), ensure_ascii=False))
+
+    def fuzzy_search(self, query, limit=10, min_similarity=0.5, candidates=200):
+        """Typo-tolerant search over bookmarks and history
+
+        The trigram index proposes the rows sharing the most of the query's
+        rarer trigrams; those are re-ranked by trigram similarity (then
+        frecency). Returns (url, title, source, similarity) tuples.
+        """
+        query_grams = trigrams(query)
+        if not self.pool.has_trigram or not query_grams:
+            return []
+
+        matches = {}
+        for table, source in (('bookmarks', 'bookmark'), ('history', 'history')):
+            ids = self._trigram_candidates(table, query, candidates)
+            if not ids:
+                continue
+            frecency = 'frecency' if table == 'history' else '0'
+            rows = self._query(f"""
+                SELECT url, title, {frecency} FROM {table} WHERE id IN ({','.join('?' * len(ids))})
+            """, ids)
+            for url, title, score in rows:
+                similarity = max(trigram_similarity(query_grams, title), trigram_similarity(query_grams, url))
+                if similarity >= min_similarity and url not in matches:
+                    matches[url] = (url, title, source, similarity, score)
+
+        # Best similarity first; bookmarks, then frecency break ties
+        ranked = sorted(matches.values(), key=lambda m: (-m[3], m[2] != 'bookmark', -m[4]))
+        return [match[:4] for match in ranked[:limit]]
+
+    def _trigram_candidates(self, table, query, candidates, max_share=0.05, keep=2):
+        """Row ids sharing the most useful query trigrams, best first
+
+        Trigrams found in more than max_share of rows say little and make the
+        lookup expensive, so they are dropped (always keeping the `keep`
+        rarest ones that exist at all). Counting hits per row is much cheaper
+        than letting FTS5 rank an OR query with bm25.
+        """
+        grams = sorted(trigrams(query, padded=False))
+        if not grams:
+            return []
+        reader = self.pool.reader()
+        counts = reader.execute(f"""
+            SELECT term, doc FROM {table}_trigram_vocab WHERE term IN ({','.join('?' * len(grams))}) ORDER BY doc
+        """, grams).fetchall()
+        total = reader.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+
+        hits = Counter()
+        for i, (term, doc) in enumerate(counts):
+            if i >= keep and doc > total * max_share:
+                break
+            hits.update(row[0] for row in reader.execute(
+                f"SELECT rowid FROM {table}_trigram WHERE {table}_trigram MATCH ?", (f'"{term}"',)
+            ))
+        return [rowid for rowid, _ in hits.most_common(candidates)]
+
+    def get_suggestions(self, text, limit=5):
+        """Get URL suggestions for autocomplete, most frecent first"""
+        fts_query = self._fts_query(text)
+        if self.has_fts and fts_query:
+            return self._query("""
+                SELECT h.url, h.title
+                FROM history_fts
+                JOIN history h ON h.id = history_fts.rowid
+                WHERE history_fts MATCH ?
+                ORDER BY h.frecency DESC
+                LIMIT ?
+            """, (fts_query, limit))
 
-    def get_suggestions(self, text):
-        """Get URL suggestions for autocomplete"""
         pattern = f"%{text}%"
-        self.cursor.execute("SELECT url, title FROM history WHERE url LIKE ? OR title LIKE ? ORDER BY timestamp DESC LIMIT 5", (pattern, pattern))
-        return self.cursor.fetchall()
+        return self._query("SELECT url, title FROM history WHERE url LIKE ? OR title LIKE ? ORDER BY frecency DESC LIMIT ?", (pattern, pattern, limit))
 
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
+        """Release this thread's connection (the shared pool stays open)"""
+        self.pool.release_reader()
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
+
+
+class HistoryWriter:
+    """Background thread that records history visits off the GUI thread
+
+    Visits are queued, repeat visits to the same URL within merge_window
+    seconds count once, and pending visits are committed together in one
+    transaction every flush_interval seconds (or once max_batch URLs pile up).
+    """
+
+    _STOP = object()
+    _FLUSH_DUE = object()
+
+    def __init__(self, db_path=None, merge_window=2.0, flush_interval=1.0, max_batch=500):
+        self.db_path = db_path
+        self.merge_window = merge_window
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._last_seen = {}  # url -> timestamp of the last queued visit
+        self._thread = threading.Thread(target=self._run, name="HistoryWriter", daemon=True)
+        self._thread.start()
+
+    def add_visit(self, url, title, timestamp=None):
+        """Queue a page visit (safe to call from the GUI thread)"""
+        self._queue.put((url, title, timestamp if timestamp is not None else time.time()))
+
+    def flush(self, timeout=None):
+        """Block until every visit queued so far has been committed"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Commit anything still queued and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        db = BrowserDatabase(self.db_path)
+        pending = {}  # url -> [title, timestamp, visit_count]
+        flush_at = None
+        try:
+            while True:
+                timeout = None if flush_at is None else max(0.0, flush_at - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = self._FLUSH_DUE
+
+                if item is self._STOP:
+                    self._commit(db, pending)
+                    break
+                if item is self._FLUSH_DUE:
+                    self._commit(db, pending)
+                    flush_at = None
+                    continue
+                if isinstance(item, threading.Event):
+                    self._commit(db, pending)
+                    flush_at = None
+                    item.set()
+                    continue
+
+                self._merge(pending, *item)
+                if flush_at is None:
+                    flush_at = time.monotonic() + self.flush_interval
+                if len(pending) >= self.max_batch:
+                    self._commit(db, pending)
+                    flush_at = None
+        finally:
+            db.close()
+
+    def _merge(self, pending, url, title, timestamp):
+        """Fold a visit into the pending batch"""
+        last_seen = self._last_seen.get(url)
+        counted = last_seen is None or timestamp - last_seen > self.merge_window
+        self._last_seen[url] = timestamp
+
+        entry = pending.get(url)
+        if entry is None:
+            pending[url] = [title, timestamp, 1 if counted else 0]
+        else:
+            entry[0] = title or entry[0]
+            entry[1] = timestamp
+            entry[2] += 1 if counted else 0
+
+    def _commit(self, db, pending):
+        """Write the pending batch in a single transaction"""
+        if not pending:
+            return
+        visits = [(url, title, timestamp, count) for url, (title, timestamp, count) in pending.items()]
+        try:
+            db.add_history_entries(visits)
+        except sqlite3.Error as e:
+            print(f"History write error: {e}")
+        pending.clear()
+
+        # Forget visits that can no longer be merged with
+        cutoff = time.time() - self.merge_window
+        self._last_seen = {url: ts for url, ts in self._last_seen.items() if ts > cutoff}
+
+class SessionWriter:
+    """Background thread that saves session snapshots off the GUI thread
+
+    Only the newest snapshot matters, so snapshots that queue up while a
+    save is running collapse into a single write.
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="SessionWriter", daemon=True)
+        self._thread.start()
+
+    def save(self, session):
+        """Queue a session snapshot (safe to call from the GUI thread)"""
+        self._queue.put(session)
+
+    def close(self, timeout=5.0):
+        """Write the last queued snapshot and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        db = BrowserDatabase(self.db_path)
+        try:
+            stop = False
+            while not stop:
+                latest = None
+                item = self._queue.get()
+                while True:
+                    if item is self._STOP:
+                        stop = True
+                    else:
+                        latest = item
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if latest is not None:
+                    try:
+                        db.save_session(latest)
+                    except sqlite3.Error as e:
+                        print(f"Session write error: {e}")
+        finally:
+            db.close()
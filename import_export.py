@@ -0,0 +1,262 @@
+import codecs
+import csv
+import html
+import json
+import os
+import re
+from html.parser import HTMLParser
+
+# Bytes read from disk per parser step
+CHUNK_SIZE = 256 * 1024
+
+# Chrome stores bookmark times as microseconds since 1601-01-01
+WEBKIT_EPOCH_OFFSET = 11644473600
+
+# Firefox smart folders and bookmarklets are not pages we can open
+SKIPPED_SCHEMES = ('place:', 'javascript:')
+
+class BookmarkFile:
+    """A bookmark export read as decoded text chunks, tracking bytes consumed"""
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.total = os.path.getsize(path)
+        self.done = 0
+
+    def __iter__(self):
+        decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+        with open(self.path, 'rb') as f:
+            while True:
+                data = f.read(self.chunk_size)
+                self.done += len(data)
+                text = decoder.decode(data, final=not data)
+                if text:
+                    yield text
+                if not data:
+                    break
+
+def _bookmark(url, title, created_at):
+    """Normalize one parsed bookmark to a (url, title, created_at) row, or None"""
+    url = (url or '').strip()
+    if not url or url.lower().startswith(SKIPPED_SCHEMES):
+        return None
+    title = ' '.join((title or '').split()) or url
+    return url, title, created_at
+
+# NETSCAPE BOOKMARK HTML
+class _NetscapeParser(HTMLParser):
+    """Collect <A HREF> entries as they stream past; folders are flattened"""
+
+    def __init__(self):
+        super().__init__()
+        self.parsed = []
+        self._link = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            self._finish_link()
+            self._link = dict(attrs)
+            self._text = []
+        elif tag in ('dt', 'dl', 'h3'):
+            # Exports from some tools never close <A>
+            self._finish_link()
+
+    def handle_endtag(self, tag):
+        if tag == 'a':
+            self._finish_link()
+
+    def handle_data(self, data):
+        if self._link is not None:
+            self._text.append(data)
+
+    def close(self):
+        super().close()
+        self._finish_link()
+
+    def _finish_link(self):
+        if self._link is None:
+            return
+        try:
+            created_at = float(self._link.get('add_date') or 0) or None
+        except ValueError:
+            created_at = None
+        row = _bookmark(self._link.get('href'), ''.join(self._text), created_at)
+        if row:
+            self.parsed.append(row)
+        self._link = None
+        self._text = []
+
+def iter_netscape_bookmarks(source):
+    """Yield (url, title, created_at) from a Netscape bookmark file, chunk by chunk"""
+    parser = _NetscapeParser()
+    for text in source:
+        parser.feed(text)
+        yield from parser.parsed
+        parser.parsed.clear()
+    parser.close()
+    yield from parser.parsed
+
+# JSON (Chrome, Firefox backups, or a flat list of {"url", "title"} objects)
+_JSON_TOKEN = re.compile(r'''
+    \s*(?:
+        ([{}\[\]:,])                                   # structure
+      | ("(?:[^"\\]|\\.)*")                            # string
+      | (-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null)  # scalar
+    )''', re.VERBOSE | re.DOTALL)
+
+# Only these members are kept while an object is open
+_JSON_FIELDS = {'url', 'uri', 'title', 'name', 'date_added', 'dateAdded', 'add_date', 'created_at'}
+
+def _json_tokens(source):
+    """Tokenize JSON text arriving in chunks without holding the whole document"""
+    buffer = ''
+    pos = 0
+    chunks = iter(source)
+    eof = False
+    while True:
+        match = _JSON_TOKEN.match(buffer, pos)
+        # A token touching the end of the buffer may continue in the next chunk
+        if (match is None or match.end() == len(buffer)) and not eof:
+            chunk = next(chunks, None)
+            if chunk is None:
+                eof = True
+            else:
+                buffer = buffer[pos:] + chunk
+                pos = 0
+            continue
+        if match is None:
+            if buffer[pos:].strip():
+                raise ValueError(f"Invalid JSON near: {buffer[pos:pos + 40]!r}")
+            return
+        pos = match.end()
+        yield match.group(1) or match.group(2) or match.group(3)
+
+def _json_created_at(obj):
+    """Convert whichever timestamp field the exporter used to Unix seconds"""
+    try:
+        if 'date_added' in obj:
+            return int(obj['date_added']) / 1e6 - WEBKIT_EPOCH_OFFSET
+        if 'dateAdded' in obj:
+            return int(obj['dateAdded']) / 1e6
+        if 'add_date' in obj or 'created_at' in obj:
+            return float(obj.get('add_date') or obj.get('created_at'))
+    except (TypeError, ValueError):
+        pass
+    return None
+
+def iter_json_bookmarks(source):
+    """Yield (url, title, created_at) for every object with a url/uri member
+
+    Objects are closed and yielded as soon as their '}' is read and are
+    never attached to their parents, so memory stays flat however deep or
+    large the export is.
+    """
+    stack = []  # open objects (None for arrays)
+    keys = []   # member name awaiting its value, per level
+    expect_key = False
+    for token in _json_tokens(source):
+        if token == '{':
+            stack.append({})
+            keys.append(None)
+            expect_key = True
+        elif token == '[':
+            stack.append(None)
+            keys.append(None)
+            expect_key = False
+        elif token in ('}', ']'):
+            obj = stack.pop()
+            keys.pop()
+            expect_key = False
+            if obj:
+                url = obj.get('url') or obj.get('uri')
+                if isinstance(url, str):
+                    row = _bookmark(url, obj.get('title') or obj.get('name'), _json_created_at(obj))
+                    if row:
+                        yield row
+        elif token == ':':
+            expect_key = False
+        elif token == ',':
+            expect_key = bool(stack) and stack[-1] is not None
+        elif expect_key:
+            keys[-1] = json.loads(token)
+        elif stack and stack[-1] is not None and keys[-1] in _JSON_FIELDS:
+            value = json.loads(token)
+            if isinstance(value, (str, int, float)):
+                stack[-1][keys[-1]] = value
+
+def import_bookmarks(db, path, batch_size=5000, progress=None):
+    """Stream a Netscape HTML or JSON bookmark export into the database
+
+    Rows go in batch_size at a time, one transaction per batch; URLs already
+    bookmarked are skipped. progress(bytes_read, total_bytes) returning
+    False stops after the current batch. Returns (imported, skipped).
+    """
+    source = BookmarkFile(path)
+    parse = iter_json_bookmarks if path.lower().endswith('.json') else iter_netscape_bookmarks
+    imported = skipped = 0
+    batch = []
+
+    def flush():
+        nonlocal imported, skipped
+        added = db.add_bookmarks_bulk(batch)
+        imported += added
+        skipped += len(batch) - added
+        batch.clear()
+        return progress is None or progress(source.done, source.total) is not False
+
+    for row in parse(source):
+        batch.append(row)
+        if len(batch) >= batch_size and not flush():
+            return imported, skipped
+    if batch:
+        flush()
+    elif progress:
+        progress(source.done, source.total)
+    return imported, skipped
+
+# EXPORT
+EXPORT_FORMATS = {'.html': 'html', '.htm': 'html', '.jsonl': 'jsonl', '.csv': 'csv'}
+
+# json.dumps() builds a fresh encoder per call when given options
+_JSONL_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+def export_format(path):
+    """Pick the export format from the file extension (Netscape HTML by default)"""
+    return EXPORT_FORMATS.get(os.path.splitext(path)[1].lower(), 'html')
+
+def write_export(f, fmt, columns, batches, title="Bookmarks", progress=None):
+    """Write row batches to an open text file as they arrive
+
+    Rows start with (url, title, timestamp); any further columns only show
+    up in the JSON Lines and CSV output. progress(rows_written) returning
+    False stops between batches. Returns the number of rows written.
+    """
+    written = 0
+    if fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(columns)
+    elif fmt == 'html':
+        f.write("<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+                '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+                f"<TITLE>{html.escape(title)}</TITLE>\n<H1>{html.escape(title)}</H1>\n<DL><p>\n")
+
+    for rows in batches:
+        if fmt == 'csv':
+            writer.writerows(rows)
+        elif fmt == 'jsonl':
+            f.writelines(_JSONL_ENCODER.encode(dict(zip(columns, row))) + "\n" for row in rows)
+        else:
+            f.writelines(
+                f'    <DT><A HREF="{html.escape(url or "")}" ADD_DATE="{int(timestamp or 0)}">'
+                f'{html.escape(name or url or "")}</A>\n'
+                for url, name, timestamp, *_ in rows
+            )
+        written += len(rows)
+        if progress and progress(written) is False:
+            break
+
+    if fmt == 'html':
+        f.write("</DL><p>\n")
+    return written
@@ -5,11 +5,12 @@ from datetime import datetime
 from urllib.parse import quote_plus
 import threading
 import time
+from collections import Counter, deque
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage, QWebEngineDownloadRequest
+from PyQt6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage, QWebEngineDownloadRequest, QWebEngineUrlRequestInterceptor
 from PyQt6.QtPrintSupport import QPrinter, QPrintDialog
 
 # Handle PyInstaller paths
@@ -34,13 +35,145 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
-from database import BrowserDatabase
+from database import BrowserDatabase, ConnectionPool, HistoryWriter, SessionWriter, SESSION_VERSION
+from import_export import import_bookmarks
+from autocomplete import NarrowingCache
+from adblock import HostBlocklist, blocklist_sources, compile_blocklists
 
 # AD BLOCK LIST
 BLOCKED_DOMAINS = {
     "doubleclick.net", "googlesyndication.com", "googleadservices.com",
     "adservice.google.com", "google-analytics.com", "adsystem.com"
 }
+BLOCKLIST = HostBlocklist(BLOCKED_DOMAINS)
+
+# QWebEngineUrlRequestInfo resource types as Adblock Plus type options
+QT_RESOURCE_TYPES = {
+    'ResourceTypeMainFrame': 'document', 'ResourceTypeSubFrame': 'subdocument',
+    'ResourceTypeStylesheet': 'stylesheet', 'ResourceTypeScript': 'script',
+    'ResourceTypeImage': 'image', 'ResourceTypeFavicon': 'image',
+    'ResourceTypeFontResource': 'font', 'ResourceTypeMedia': 'media',
+    'ResourceTypeObject': 'object', 'ResourceTypePluginResource': 'object',
+    'ResourceTypeXhr': 'xmlhttprequest', 'ResourceTypePing': 'ping',
+    'ResourceTypeCspReport': 'ping', 'ResourceTypeWebSocket': 'websocket',
+}
+
+# Rough transfer size of a blocked request, for the "bytes saved" estimate
+ESTIMATED_BYTES = {
+    'document': 60_000, 'subdocument': 60_000, 'script': 40_000, 'stylesheet': 15_000,
+    'image': 20_000, 'font': 30_000, 'media': 250_000, 'object': 50_000,
+    'xmlhttprequest': 3_000, 'ping': 500, 'websocket': 1_000, 'other': 5_000,
+}
+
+# Clear Browsing Data time ranges (seconds back from now, None = everything)
+TIME_RANGES = {
+    "Last Hour": 3600,
+    "Last Day": 24 * 3600,
+    "Last Week": 7 * 24 * 3600,
+    "Last 4 Weeks": 28 * 24 * 3600,
+    "All Time": None,
+}
+
+class BackgroundTask(QThread):
+    """Run a long database job off the GUI thread
+
+    The job is called with a progress(done, total) keyword argument; the
+    callback forwards to the progress signal and returns False once the
+    task has been cancelled, so jobs can stop between chunks.
+    """
+    progress = pyqtSignal(int, int)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, job, *args, parent=None, **kwargs):
+        super().__init__(parent)
+        self.job = job
+        self.args = args
+        self.kwargs = kwargs
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def report_progress(self, done, total):
+        self.progress.emit(done, total)
+        return not self._cancelled
+
+    def run(self):
+        try:
+            result = self.job(*self.args, progress=self.report_progress, **self.kwargs)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+
+class SuggestionWorker(QThread):
+    """Run URL bar suggestion lookups off the GUI thread, newest request only
+
+    request() replaces whatever request is waiting. A lookup still running
+    when a newer request arrives is interrupted on this thread's SQLite
+    connection, and only results nothing has superseded are emitted.
+    """
+    ready = pyqtSignal(int, str, list)
+    
+    def __init__(self, lookup, db, parent=None):
+        super().__init__(parent)
+        self.lookup = lookup  # lookup(text) -> [url, ...], called on this thread
+        self.db = db
+        self._condition = threading.Condition()
+        self._pending = None  # (generation, text)
+        self._busy = False
+        self._stopped = False
+        self._connection = None
+    
+    def request(self, generation, text):
+        with self._condition:
+            self._pending = (generation, text)
+            self._interrupt()
+            self._condition.notify()
+    
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._interrupt()
+            self._condition.notify()
+        self.wait()
+    
+    def _interrupt(self):
+        if self._busy and self._connection is not None:
+            self._connection.interrupt()
+    
+    def run(self):
+        self._connection = self.db.pool.reader()
+        try:
+            while True:
+                with self._condition:
+                    while self._pending is None and not self._stopped:
+                        self._condition.wait()
+                    if self._stopped:
+                        return
+                    generation, text = self._pending
+                    self._pending = None
+                    self._busy = True
+                try:
+                    results = self.lookup(text)
+                except sqlite3.OperationalError as e:
+                    # Interrupted by a newer request (or stop) - anything else is a real failure
+                    if str(e) != 'interrupted':
+                        print(f"Suggestion error: {e}")
+                    continue
+                except Exception as e:
+                    print(f"Suggestion error: {e}")
+                    continue
+                finally:
+                    with self._condition:
+                        self._busy = False
+                with self._condition:
+                    superseded = self._pending is not None
+                if not superseded:
+                    self.ready.emit(generation, text, results)
+        finally:
+            self.db.close()
 
 class BookmarkManager(QDialog):
     def __init__(self, parent=None):
@@ -188,16 +321,22 @@ class BookmarkManager(QDialog):
             self.folder_combo.addItem(folder_name)
     
     def import_bookmarks(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "Import Bookmarks", "", "HTML Files (*.html);;JSON Files (*.json)")
-        if file_path:
-            # Basic import implementation
-            self.parent_browser.status_label.setText(f"📥 Bookmarks imported from {file_path}")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Import Bookmarks", "", "Bookmark Files (*.html *.htm *.json);;HTML Files (*.html *.htm);;JSON Files (*.json)")
+        if file_path and self.parent_browser:
+            browser = self.parent_browser
+            
+            def on_done(result):
+                imported, skipped = result
+                browser.status_label.setText(f"📥 Imported {imported:,} bookmarks ({skipped:,} already saved)")
+                if self.isVisible():
+                    self.load_bookmarks()
+            
+            # Streams the file in chunks on a worker thread
+            browser.run_background_task("📥 Importing bookmarks", import_bookmarks, browser.db, file_path, on_done=on_done)
     
     def export_bookmarks(self):
-        file_path, _ = QFileDialog.getSaveFileName(self, "Export Bookmarks", "bookmarks.html", "HTML Files (*.html)")
-        if file_path:
-            # Basic export implementation
-            self.parent_browser.status_label.setText(f"📤 Bookmarks exported to {file_path}")
+        if self.parent_browser:
+            self.parent_browser.export_data('bookmarks', self)
 
 class HistoryViewer(QDialog):
     def __init__(self, parent=None):
@@ -220,6 +359,10 @@ class HistoryViewer(QDialog):
         self.clear_history_btn.clicked.connect(self.clear_all_history)
         search_layout.addWidget(self.clear_history_btn)
         
+        self.export_history_btn = QPushButton("📤 Export")
+        self.export_history_btn.clicked.connect(self.export_history)
+        search_layout.addWidget(self.export_history_btn)
+        
         layout.addLayout(search_layout)
         
         # History list
@@ -254,15 +397,14 @@ class HistoryViewer(QDialog):
     def search_history(self, text):
         self.history_list.clear()
         if self.parent_browser and text:
-            history = self.parent_browser.db.get_history(limit=100)
+            history = self.parent_browser.db.search_history(text, limit=100)
             for url, title, timestamp in history:
-                if text.lower() in title.lower() or text.lower() in url.lower():
-                    from datetime import datetime
-                    date_str = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
-                    
-                    item = QListWidgetItem(f"🌐 {title} - {date_str}")
-                    item.setData(1, {'url': url, 'title': title, 'timestamp': timestamp})
-                    self.history_list.addItem(item)
+                from datetime import datetime
+                date_str = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+                item = QListWidgetItem(f"🌐 {title} - {date_str}")
+                item.setData(1, {'url': url, 'title': title, 'timestamp': timestamp})
+                self.history_list.addItem(item)
         elif not text:
             self.load_history()
     
@@ -280,9 +422,12 @@ class HistoryViewer(QDialog):
         reply = QMessageBox.question(self, "Clear History", "Are you sure you want to clear all history?", 
                                    QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes and self.parent_browser:
-            self.parent_browser.db.clear_history()
-            self.load_history()
-            self.parent_browser.status_label.setText("🗑️ History cleared")
+            self.history_list.clear()
+            self.parent_browser.clear_history_range(None)
+    
+    def export_history(self):
+        if self.parent_browser:
+            self.parent_browser.export_data('history', self)
 
 class DeveloperTools(QDialog):
     def __init__(self, parent=None):
@@ -460,9 +605,34 @@ Security:
 - HTTPS: {'Yes' if url.startswith('https://') else 'No'}
 - Mixed Content: Check console for warnings
 """
-                self.info_text.setText(info)
             else:
-                self.info_text.setText("No page loaded")
+                info = "No page loaded\n"
+            
+            stats = self.parent_browser.tab_lifecycle.stats()
+            mb = 1024 * 1024
+            info += f"""
+Tab Memory:
+- Live tabs: {stats['live_tabs']} (~{stats['estimated_bytes'] // mb} MB of {stats['budget_bytes'] // mb} MB budget)
+- Unloaded tabs (discarded or not yet opened): {stats['unloaded_tabs']}
+- Discards so far: {stats['discard_count']} (~{stats['reclaimed_bytes'] // mb} MB reclaimed)
+- Frozen tabs: {stats['frozen_tabs']} ({stats['freeze_count']} freezes so far)
+"""
+            
+            cache = self.parent_browser.suggestion_cache.stats()
+            info += f"""
+URL Bar Suggestion Cache:
+- Lookups: {cache['lookups']:,} ({cache['hit_rate']:.0%} answered by narrowing a previous result)
+- Average database query: {cache['avg_miss_ms']:.2f} ms, average cache hit: {cache['avg_hit_ms']:.3f} ms
+- Time saved: ~{cache['saved_ms']:,.0f} ms
+"""
+            
+            top_blocked = self.parent_browser.db.get_top_blocked_domains(5)
+            if top_blocked:
+                info += "\nMost Blocked Domains:\n" + "".join(
+                    f"- {domain}: {count:,} requests (~{format_size(size)})\n"
+                    for domain, count, size in top_blocked
+                )
+            self.info_text.setText(info)
 
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
@@ -484,7 +654,7 @@ class SettingsDialog(QDialog):
         # Homepage setting
         homepage_layout = QHBoxLayout()
         homepage_layout.addWidget(QLabel("Homepage:"))
-        self.homepage_input = QLineEdit("http://127.0.0.1:5000/")
+        self.homepage_input = QLineEdit()
         homepage_layout.addWidget(self.homepage_input)
         general_layout.addLayout(homepage_layout)
         
@@ -575,7 +745,7 @@ class SettingsDialog(QDialog):
     def load_settings(self):
         if self.parent_browser and hasattr(self.parent_browser, 'settings'):
             settings = self.parent_browser.settings
-            self.homepage_input.setText(settings.get('homepage', 'http://127.0.0.1:5000/'))
+            self.homepage_input.setText(settings.get('homepage', f"{self.parent_browser.server_url}/"))
             self.search_engine.setCurrentText(settings.get('search_engine', 'DuckDuckGo'))
             self.theme_combo.setCurrentText(settings.get('theme', 'Light'))
             self.restore_session.setChecked(settings.get('restore_session', False))
@@ -601,18 +771,245 @@ class SettingsDialog(QDialog):
             self.parent_browser.status_label.setText("✅ Settings saved successfully")
         self.accept()
 
+# Terminal download states as stored in the downloads table
+DOWNLOAD_STATES = {
+    QWebEngineDownloadRequest.DownloadState.DownloadCompleted: 'Completed',
+    QWebEngineDownloadRequest.DownloadState.DownloadCancelled: 'Cancelled',
+    QWebEngineDownloadRequest.DownloadState.DownloadInterrupted: 'Interrupted',
+}
+
+def format_size(num_bytes):
+    """Human readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024 or unit == 'GB':
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+class DownloadRegistry(QObject):
+    """Live downloads, persisted to the downloads table in batches
+
+    Byte-progress signals only touch memory. A timer writes every download
+    that changed since the last tick in one transaction and refreshes the
+    throughput estimates; state changes are written straight away.
+    """
+    FLUSH_INTERVAL_MS = 1000
+    RATE_SMOOTHING = 0.3  # weight of the newest sample in the moving average
+    
+    added = pyqtSignal(int)
+    updated = pyqtSignal(list)
+    finished = pyqtSignal(object)
+    
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.active = {}
+        self._dirty = set()
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self._timer.timeout.connect(self.flush)
+    
+    def track(self, request, path):
+        """Start recording an accepted QWebEngineDownloadRequest"""
+        total = request.totalBytes()
+        url = request.url().toString()
+        download_id = self.db.add_download(url, os.path.basename(path), path, total if total > 0 else None)
+        now = time.time()
+        record = {
+            'id': download_id, 'url': url, 'filename': os.path.basename(path), 'path': path,
+            'state': 'Downloading', 'bytes_received': 0, 'size_bytes': total if total > 0 else None,
+            'started_at': now, 'downloaded_at': None,
+            'rate': 0.0, 'peak_rate': 0.0, 'sample': (now, 0),
+            'page': request.page(),
+        }
+        self.active[download_id] = record
+        
+        request.receivedBytesChanged.connect(lambda: self.on_progress(download_id, request))
+        request.totalBytesChanged.connect(lambda: self.on_progress(download_id, request))
+        request.stateChanged.connect(lambda state: self.on_state_changed(download_id, state))
+        
+        if not self._timer.isActive():
+            self._timer.start()
+        self.added.emit(download_id)
+        return record
+    
+    def on_progress(self, download_id, request):
+        record = self.active.get(download_id)
+        if record:
+            total = request.totalBytes()
+            record['bytes_received'] = request.receivedBytes()
+            record['size_bytes'] = total if total > 0 else None
+            self._dirty.add(download_id)
+    
+    def on_state_changed(self, download_id, state):
+        record = self.active.get(download_id)
+        if record is None or state not in DOWNLOAD_STATES:
+            return
+        record['state'] = DOWNLOAD_STATES[state]
+        if record['state'] == 'Completed':
+            record['downloaded_at'] = time.time()
+        self._dirty.add(download_id)
+        self.flush()
+        del self.active[download_id]
+        self.finished.emit(record)
+    
+    def flush(self):
+        """Update throughput and write changed downloads to the database"""
+        now = time.time()
+        for record in self.active.values():
+            last_time, last_bytes = record['sample']
+            elapsed = now - last_time
+            if record['state'] == 'Downloading' and elapsed > 0:
+                sample = (record['bytes_received'] - last_bytes) / elapsed
+                record['rate'] += self.RATE_SMOOTHING * (sample - record['rate'])
+                record['peak_rate'] = max(record['peak_rate'], sample)
+                record['sample'] = (now, record['bytes_received'])
+        
+        if self._dirty:
+            changed = sorted(self._dirty)
+            self._dirty.clear()
+            try:
+                self.db.update_downloads([
+                    (r['id'], r['state'], r['bytes_received'], r['size_bytes'])
+                    for r in (self.active[i] for i in changed)
+                ])
+            except sqlite3.Error as e:
+                print(f"❌ Saving download progress failed: {e}")
+            self.updated.emit(changed)
+        
+        if not self.active:
+            self._timer.stop()
+    
+    def stats(self, download_id):
+        """Throughput figures for a live download (None once it has finished)"""
+        record = self.active.get(download_id)
+        if record is None:
+            return None
+        elapsed = max(time.time() - record['started_at'], 1e-6)
+        remaining = (record['size_bytes'] or 0) - record['bytes_received']
+        return {
+            'rate': record['rate'],
+            'peak_rate': record['peak_rate'],
+            'average_rate': record['bytes_received'] / elapsed,
+            'eta': remaining / record['rate'] if record['rate'] > 0 and remaining > 0 else None,
+        }
+    
+    def is_downloading(self, page):
+        """Whether a live download was started from this page"""
+        return any(record['page'] is page for record in self.active.values())
+    
+    def overall_progress(self):
+        """(received, total) bytes over live downloads of known size"""
+        sized = [r for r in self.active.values() if r['size_bytes']]
+        return sum(r['bytes_received'] for r in sized), sum(r['size_bytes'] for r in sized)
+    
+    def close(self):
+        self._timer.stop()
+        self.flush()
+
+class DownloadsModel(QAbstractListModel):
+    """Downloads read from the database a page at a time as the view scrolls"""
+    PAGE_SIZE = 50
+    FIELDS = ('id', 'url', 'filename', 'path', 'state', 'bytes_received', 'size_bytes', 'started_at', 'downloaded_at')
+    
+    def __init__(self, db, registry, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.registry = registry
+        self.records = []
+        self._rows = {}
+        self._total = 0
+        registry.added.connect(self.on_added)
+        registry.updated.connect(self.on_updated)
+        self.reload()
+    
+    def detach(self):
+        """Stop following the registry once the dialog showing this model closes"""
+        self.registry.added.disconnect(self.on_added)
+        self.registry.updated.disconnect(self.on_updated)
+    
+    def reload(self):
+        self.beginResetModel()
+        self.records = []
+        self._rows = {}
+        self._total = self.db.get_download_count()
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+    
+    def canFetchMore(self, parent):
+        return not parent.isValid() and len(self.records) < self._total
+    
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        before_id = self.records[-1]['id'] if self.records else None
+        page = self.db.get_downloads(self.PAGE_SIZE, before_id=before_id)
+        if not page:
+            self._total = len(self.records)
+            return
+        
+        self.beginInsertRows(QModelIndex(), len(self.records), len(self.records) + len(page) - 1)
+        for row in page:
+            record = dict(zip(self.FIELDS, row))
+            # Live downloads share the registry's record so updates show up in place
+            record = self.registry.active.get(record['id'], record)
+            self._rows[record['id']] = len(self.records)
+            self.records.append(record)
+        self.endInsertRows()
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.records[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.describe(record)
+        if role == Qt.ItemDataRole.UserRole:
+            return record
+        return None
+    
+    def describe(self, record):
+        text = f"📄 {record['filename']} - {record['state']}"
+        received, total = record['bytes_received'] or 0, record['size_bytes']
+        if record['state'] == 'Downloading':
+            text += f" ({format_size(received)}{f' / {format_size(total)}' if total else ''})"
+            stats = self.registry.stats(record['id'])
+            if stats and stats['rate'] > 0:
+                text += f" @ {format_size(stats['rate'])}/s"
+                if stats['eta'] is not None:
+                    text += f", {int(stats['eta'])}s left"
+        elif total:
+            text += f" ({format_size(total)})"
+        return text
+    
+    def on_added(self, download_id):
+        self.reload()
+    
+    def on_updated(self, download_ids):
+        for download_id in download_ids:
+            row = self._rows.get(download_id)
+            if row is not None:
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+
 class DownloadsManager(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("📥 Downloads Manager")
         self.setGeometry(100, 100, 800, 600)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
         self.parent_browser = parent
         
         layout = QVBoxLayout(self)
         
-        # Downloads list
-        self.downloads_list = QListWidget()
-        self.downloads_list.itemDoubleClicked.connect(self.open_download)
+        # Downloads list - rows are fetched from the database as they scroll into view
+        self.downloads_model = DownloadsModel(parent.db, parent.download_registry, self)
+        self.finished.connect(self.downloads_model.detach)
+        self.downloads_list = QListView()
+        self.downloads_list.setModel(self.downloads_model)
+        self.downloads_list.setUniformItemSizes(True)
+        self.downloads_list.doubleClicked.connect(self.open_download)
         layout.addWidget(self.downloads_list)
         
         # Buttons
@@ -621,7 +1018,7 @@ class DownloadsManager(QDialog):
         self.refresh_btn = QPushButton("🔄 Refresh")
         self.refresh_btn.clicked.connect(self.refresh_downloads)
         
-        self.clear_btn = QPushButton("🗑️ Clear Completed")
+        self.clear_btn = QPushButton("🗑️ Clear Finished")
         self.clear_btn.clicked.connect(self.clear_completed)
         
         self.open_folder_btn = QPushButton("📁 Open Downloads Folder")
@@ -633,20 +1030,13 @@ class DownloadsManager(QDialog):
         button_layout.addStretch()
         
         layout.addLayout(button_layout)
-        
-        self.refresh_downloads()
     
     def refresh_downloads(self):
-        self.downloads_list.clear()
-        if self.parent_browser:
-            for download in self.parent_browser.downloads:
-                item = QListWidgetItem(f"📄 {download['filename']} - {download['status']}")
-                item.setData(1, download)  # Store download data
-                self.downloads_list.addItem(item)
-    
-    def open_download(self, item):
-        download = item.data(1)
-        if download and download['status'] == 'Completed':
+        self.downloads_model.reload()
+    
+    def open_download(self, index):
+        download = index.data(Qt.ItemDataRole.UserRole)
+        if download and download['state'] == 'Completed':
             import os
             import subprocess
             if os.path.exists(download['path']):
@@ -657,7 +1047,7 @@ class DownloadsManager(QDialog):
     
     def clear_completed(self):
         if self.parent_browser:
-            self.parent_browser.downloads = [d for d in self.parent_browser.downloads if d['status'] != 'Completed']
+            self.parent_browser.db.clear_finished_downloads()
             self.refresh_downloads()
     
     def open_downloads_folder(self):
@@ -672,30 +1062,276 @@ class DownloadsManager(QDialog):
         elif os.name == 'posix':  # macOS/Linux
             subprocess.run(['open' if sys.platform == 'darwin' else 'xdg-open', downloads_path])
 
-class AdBlockPage(QWebEnginePage):
-    def __init__(self, profile, parent=None):
-        super().__init__(profile, parent)
-        self.parent_browser = parent
+class AdBlockInterceptor(QWebEngineUrlRequestInterceptor):
+    """Block every request to a listed host - documents, scripts, images, XHR...
+
+    Qt 6 calls interceptRequest on the UI thread for profile interceptors,
+    so it only matches and hands each blocked request to AdBlockStats,
+    which attributes it on its own timer. One interceptor serves the shared
+    default profile and another every private profile (see AdBlocker).
+    """
     
-    def acceptNavigationRequest(self, url, nav_type, is_main_frame):
-        url_str = url.toString().lower()
-        for domain in BLOCKED_DOMAINS:
-            if domain in url_str:
-                # Try to update status if parent browser is available
-                try:
-                    # Find the main browser window
-                    main_window = None
-                    if self.parent_browser and hasattr(self.parent_browser, 'status_label'):
-                        main_window = self.parent_browser
-                    elif hasattr(self, 'parent_browser') and self.parent_browser:
-                        main_window = self.parent_browser
-                    
-                    if main_window:
-                        main_window.status_label.setText("🚫 AD BLOCKED!")
-                except:
-                    pass  # Don't crash on status update
-                return False
-        return super().acceptNavigationRequest(url, nav_type, is_main_frame)
+    def __init__(self, adblocker, blocklist, private, parent=None):
+        super().__init__(parent)
+        self.adblocker = adblocker
+        self.blocklist = blocklist
+        self.private = private
+    
+    def interceptRequest(self, info):
+        adblocker = self.adblocker
+        if not adblocker.enabled:
+            return
+        url = info.requestUrl()
+        host = url.host()
+        resource_type = QT_RESOURCE_TYPES.get(info.resourceType().name, 'other')
+        if self.blocklist.matches(host):
+            self.block(info, host, resource_type)
+            return
+        # One read of the reference: a reload swapping it mid-request can't mix old and new lists
+        lists = adblocker.blocklists
+        if lists is not None and lists.match(url.toString(), host, info.firstPartyUrl().host(), resource_type):
+            self.block(info, host, resource_type)
+    
+    def block(self, info, host, resource_type):
+        info.block(True)
+        self.adblocker.stats.record(info.firstPartyUrl(), host, resource_type, self.private)
+
+class AdBlockStats(QObject):
+    """Per-tab and per-domain blocking totals, shown on every window's AdBlock button
+
+    Blocked requests are queued by record(). Every REFRESH_INTERVAL_MS the
+    queue is drained: each event is credited to the tab showing its page,
+    in whichever window that is, and to its domain, and a button is
+    relabelled only if its numbers moved. A page blocking hundreds of
+    requests costs one widget update per interval, not one per request.
+    Domain totals are written to the blocked_domains table every
+    PERSIST_INTERVAL_MS (never for private profiles).
+    """
+    REFRESH_INTERVAL_MS = 1000
+    PERSIST_INTERVAL_MS = 30000
+    BLOCKED_BACKLOG = 10000  # events kept if the GUI falls behind
+    
+    def __init__(self, adblocker):
+        super().__init__(adblocker)
+        self.adblocker = adblocker
+        self.blocked_requests = 0
+        self.blocked_bytes = 0
+        self.blocked = deque(maxlen=self.BLOCKED_BACKLOG)  # (page url, host, estimated bytes, private)
+        self.pending = Counter()        # domain -> blocks not yet persisted
+        self.pending_bytes = Counter()
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+        self.persist_timer = QTimer(self)
+        self.persist_timer.setInterval(self.PERSIST_INTERVAL_MS)
+        self.persist_timer.timeout.connect(self.persist)
+        self.persist_timer.start()
+    
+    @staticmethod
+    def page_key(private, url):
+        return private, url.adjusted(QUrl.UrlFormattingOption.RemoveFragment).toString()
+    
+    def record(self, page_url, host, resource_type, private):
+        size = ESTIMATED_BYTES.get(resource_type, ESTIMATED_BYTES['other'])
+        self.blocked_requests += 1
+        self.blocked_bytes += size
+        self.blocked.append((page_url, host, size, private))
+    
+    def refresh(self):
+        """Attribute the events blocked since the last refresh and update the buttons"""
+        blocked = self.blocked
+        if blocked:
+            pages = {}
+            for browser in self.adblocker.windows:
+                tab_widget = browser.tab_widget
+                for i in range(tab_widget.count()):
+                    webview = tab_widget.widget(i)
+                    if isinstance(webview, QWebEngineView):
+                        pages[self.page_key(browser.is_incognito, webview.url())] = webview
+            
+            for _ in range(len(blocked)):
+                page_url, host, size, private = blocked.popleft()
+                webview = pages.get(self.page_key(private, page_url))
+                if webview is not None:
+                    webview.blocked_requests = getattr(webview, 'blocked_requests', 0) + 1
+                    webview.blocked_bytes = getattr(webview, 'blocked_bytes', 0) + size
+                if not private:
+                    self.pending[host] += 1
+                    self.pending_bytes[host] += size
+        self.update_buttons()
+    
+    def update_buttons(self):
+        for browser in self.adblocker.windows:
+            self.update_button(browser)
+    
+    def update_button(self, browser):
+        webview = browser.current_webview()
+        count = getattr(webview, 'blocked_requests', 0)
+        size = getattr(webview, 'blocked_bytes', 0)
+        if not self.adblocker.enabled:
+            label = ("🚫", "AdBlock is off")
+        else:
+            label = (
+                f"🚫 {count:,}" if count else "🚫",
+                f"Blocked on this page: {count:,} requests (~{format_size(size)})\n"
+                f"Blocked in total: {self.blocked_requests:,} requests "
+                f"(~{format_size(self.blocked_bytes)})"
+            )
+        if label != getattr(browser, 'adblock_label', None):
+            browser.adblock_label = label
+            browser.adblock_btn.setText(label[0])
+            browser.adblock_btn.setToolTip(label[1])
+    
+    def persist(self):
+        """Add the domain totals gathered since the last write to blocked_domains"""
+        if not self.pending:
+            return
+        rows = [(domain, count, self.pending_bytes[domain]) for domain, count in self.pending.items()]
+        self.pending.clear()
+        self.pending_bytes.clear()
+        self.adblocker.db.record_blocked_domains(rows)
+    
+    def close(self):
+        self.refresh_timer.stop()
+        self.persist_timer.stop()
+        self.refresh()
+        self.persist()
+
+class BlocklistManager(QObject):
+    """Watch the blocklists folder and hot-swap the lists whenever it changes
+
+    Lists are compiled on a BackgroundTask. The finished Blocklists object
+    replaces adblocker.blocklists in a single assignment, so the interceptors
+    keep matching against the previous lists until the new ones are
+    complete and never wait on a rebuild.
+    """
+    RELOAD_DELAY_MS = 500  # editors and downloads save in several writes
+    
+    status = pyqtSignal(str)
+    
+    def __init__(self, adblocker, folder):
+        super().__init__(adblocker)
+        self.adblocker = adblocker
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.task = None
+        self.pending = False
+        self.started = 0.0
+        
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_reload)
+        self.watcher.fileChanged.connect(self.schedule_reload)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.RELOAD_DELAY_MS)
+        self.timer.timeout.connect(self.reload)
+        self.reload()
+    
+    def watch(self):
+        """Watch the folder and every list in it - files replaced on save drop their old watch"""
+        watched = set(self.watcher.files()) | set(self.watcher.directories())
+        paths = [self.folder] + [path for path, _, _ in blocklist_sources(self.folder)]
+        missing = [path for path in paths if path not in watched]
+        if missing:
+            self.watcher.addPaths(missing)
+    
+    def schedule_reload(self, *args):
+        self.timer.start()
+    
+    def reload(self):
+        """Recompile on a worker thread if any list was added, removed or changed"""
+        if self.task is not None:
+            self.pending = True
+            return
+        self.watch()
+        current = self.adblocker.blocklists
+        if current is not None and current.sources == blocklist_sources(self.folder):
+            return
+        
+        self.started = time.perf_counter()
+        self.task = BackgroundTask(compile_blocklists, self.folder, parent=self)
+        self.task.succeeded.connect(self.swap)
+        self.task.failed.connect(self.on_failed)
+        self.task.finished.connect(self.on_task_finished)
+        self.task.start()
+    
+    def swap(self, blocklists):
+        self.adblocker.blocklists = blocklists
+        elapsed = (time.perf_counter() - self.started) * 1000
+        self.status.emit(
+            f"🛡️ Blocklists reloaded in {elapsed:.0f} ms - "
+            f"{blocklists.rule_count:,} filter rules, {blocklists.host_count:,} hosts"
+        )
+    
+    def on_failed(self, error):
+        self.status.emit(f"⚠️ Blocklist reload failed: {error}")
+    
+    def on_task_finished(self):
+        self.task = None
+        # Lists changed again while compiling
+        if self.pending:
+            self.pending = False
+            self.reload()
+    
+    def close(self):
+        self.timer.stop()
+        if self.task is not None:
+            self.task.wait()
+
+class AdBlocker(QObject):
+    """Ad blocking shared by every window of the application
+
+    All windows browse on QWebEngineProfile.defaultProfile(), and a profile
+    keeps only the last interceptor set on it, so blocking can't belong to
+    a window. One AdBlocker per process owns the interceptors, the AdBlock
+    switch, the hot-swapped lists and the counters; windows register to
+    have their private profile covered and their button kept current.
+    """
+    _instance = None
+    
+    @classmethod
+    def instance(cls, db_path):
+        """The application's AdBlocker, created on first use"""
+        if cls._instance is None:
+            cls._instance = cls(db_path, QApplication.instance())
+        return cls._instance
+    
+    def __init__(self, db_path, parent=None):
+        super().__init__(parent)
+        self.db = BrowserDatabase(db_path)
+        self.enabled = True
+        self.blocklists = None
+        self.windows = []
+        self.stats = AdBlockStats(self)
+        
+        # Built-in BLOCKLIST first, then lists from the blocklists folder next to the database
+        self.interceptor = AdBlockInterceptor(self, BLOCKLIST, private=False, parent=self)
+        self.private_interceptor = AdBlockInterceptor(self, BLOCKLIST, private=True, parent=self)
+        QWebEngineProfile.defaultProfile().setUrlRequestInterceptor(self.interceptor)
+        self.manager = BlocklistManager(self, os.path.join(os.path.dirname(os.path.abspath(db_path)), 'blocklists'))
+        if parent is not None:
+            parent.aboutToQuit.connect(self.close)
+    
+    def register(self, browser):
+        """Block on browser's private profile and keep its AdBlock button current"""
+        browser.incognito_profile.setUrlRequestInterceptor(self.private_interceptor)
+        self.windows.append(browser)
+        self.manager.status.connect(browser.show_status)
+    
+    def unregister(self, browser):
+        if browser in self.windows:
+            self.windows.remove(browser)
+            self.manager.status.disconnect(browser.show_status)
+    
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.stats.update_buttons()
+    
+    def close(self):
+        self.manager.close()
+        self.stats.close()
 
 class WebTab(QWidget):
     titleChanged = pyqtSignal(str)
@@ -708,7 +1344,8 @@ class WebTab(QWidget):
         
         self.webview = QWebEngineView()
         profile = browser.incognito_profile if browser.is_incognito else browser.normal_profile
-        self.page = AdBlockPage(profile, self.webview)
+        # Blocking (main frames included) is done by the app-wide AdBlocker's interceptors
+        self.page = QWebEnginePage(profile, self.webview)
         self.webview.setPage(self.page)
         
         layout = QVBoxLayout(self)
@@ -739,8 +1376,8 @@ class WebTab(QWidget):
             url = self.webview.url().toString()
             title = self.webview.title()
             # Track all pages except local server pages and incognito mode
-            if url and not url.startswith('http://127.0.0.1:5000') and not self.browser.is_incognito:
-                self.browser.db.add_history_entry(url, title)
+            if url and not url.startswith(self.browser.server_url) and not self.browser.is_incognito:
+                self.browser.history_writer.add_visit(url, title)
                 self.browser.status_label.setText(f"📜 Tracked: {title[:30]}{'...' if len(title) > 30 else ''}")
             elif self.browser.is_incognito:
                 self.browser.status_label.setText("🕶️ Private browsing - no tracking")
@@ -822,8 +1459,169 @@ class WebTab(QWidget):
         # Show menu
         menu.exec(self.webview.mapToGlobal(pos))
 
+class TabPlaceholder(QWidget):
+    """Stand-in for a restored tab that has not been opened yet
+
+    Keeps the saved URL, title and pinned state (and answers url()/title()
+    like a web view) so an unopened tab costs no renderer process.
+    """
+    def __init__(self, url, title='', pinned=False, last_active=0):
+        super().__init__()
+        self.saved_url = url
+        self.saved_title = title
+        self.is_pinned = pinned
+        self.last_active = last_active
+        self.scroll_position = None
+        
+        layout = QVBoxLayout(self)
+        label = QLabel(f"⏳ {title or url}")
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(label)
+    
+    def url(self):
+        return QUrl(self.saved_url)
+    
+    def title(self):
+        return self.saved_title
+
+class TabLifecycleManager(QObject):
+    """Freeze idle background tabs and keep live tabs within a memory budget
+
+    Tabs hidden for freeze_after seconds are moved to the Frozen lifecycle
+    state (no timers, animations or scripts) and woken when selected.
+
+    Qt WebEngine has no per-renderer memory API, so each live tab is costed
+    at BASE_TAB_MEMORY plus the JS heap its page reports. Over budget, the
+    least recently used tabs are discarded back to TabPlaceholders that
+    reload (and re-scroll) when selected.
+    """
+    CHECK_INTERVAL_MS = 10000
+    BASE_TAB_MEMORY = 50 * 1024 * 1024
+    SAMPLE_SCRIPT = "[performance.memory ? performance.memory.usedJSHeapSize : 0, window.scrollX, window.scrollY]"
+    
+    def __init__(self, browser, budget_mb, freeze_after=300):
+        super().__init__(browser)
+        self.browser = browser
+        self.budget = budget_mb * 1024 * 1024
+        self.freeze_after = freeze_after
+        self.discard_count = 0
+        self.reclaimed_bytes = 0
+        self.freeze_count = 0
+        
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.CHECK_INTERVAL_MS)
+        self.timer.timeout.connect(self.check)
+        self.timer.start()
+    
+    def live_tabs(self):
+        tab_widget = self.browser.tab_widget
+        return [
+            tab_widget.widget(i) for i in range(tab_widget.count())
+            if isinstance(tab_widget.widget(i), QWebEngineView)
+        ]
+    
+    def estimate(self, webview):
+        """Approximate bytes held by a live tab (from its last sample)"""
+        return self.BASE_TAB_MEMORY + getattr(webview, 'js_heap', 0)
+    
+    def check(self):
+        """Refresh samples from awake pages, enforce the budget, then freeze idle tabs"""
+        for webview in self.live_tabs():
+            # Frozen pages would only answer once woken - keep their last sample
+            if webview.page().lifecycleState() == QWebEnginePage.LifecycleState.Active:
+                webview.page().runJavaScript(self.SAMPLE_SCRIPT, lambda result, view=webview: self.store_sample(view, result))
+        self.enforce_budget()
+        self.freeze_idle_tabs()
+    
+    def store_sample(self, webview, result):
+        if isinstance(result, list) and len(result) == 3:
+            heap, x, y = result
+            webview.js_heap = int(heap or 0)
+            webview.scroll_position = (x or 0, y or 0)
+    
+    def discardable(self, webview):
+        """Background tabs only - never the one in view, pinned or audible tabs"""
+        return (
+            webview is not self.browser.tab_widget.currentWidget()
+            and not getattr(webview, 'is_pinned', False)
+            and not webview.page().recentlyAudible()
+        )
+    
+    def freezable(self, webview, now):
+        """Hidden long enough, not busy, and Qt agrees the page can leave the Active state"""
+        page = webview.page()
+        return (
+            self.discardable(webview)
+            and now - getattr(webview, 'hidden_since', now) >= self.freeze_after
+            and not self.browser.download_registry.is_downloading(page)
+            and page.lifecycleState() == QWebEnginePage.LifecycleState.Active
+            and page.recommendedState() != QWebEnginePage.LifecycleState.Active
+        )
+    
+    def freeze_idle_tabs(self):
+        if not self.freeze_after or self.freeze_after <= 0:
+            return
+        now = time.time()
+        for webview in self.live_tabs():
+            if self.freezable(webview, now):
+                webview.page().setLifecycleState(QWebEnginePage.LifecycleState.Frozen)
+                self.freeze_count += 1
+    
+    def wake(self, webview):
+        """Bring a selected tab back to the Active state"""
+        page = webview.page()
+        if page.lifecycleState() != QWebEnginePage.LifecycleState.Active:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+    
+    def enforce_budget(self):
+        live = self.live_tabs()
+        total = sum(self.estimate(webview) for webview in live)
+        candidates = sorted(
+            (webview for webview in live if self.discardable(webview)),
+            key=lambda webview: getattr(webview, 'last_active', 0)
+        )
+        for webview in candidates:
+            if total <= self.budget:
+                break
+            freed = self.estimate(webview)
+            if self.browser.discard_tab(self.browser.tab_widget.indexOf(webview)) is not None:
+                total -= freed
+                self.discard_count += 1
+                self.reclaimed_bytes += freed
+    
+    def stats(self):
+        live = self.live_tabs()
+        return {
+            'live_tabs': len(live),
+            'unloaded_tabs': self.browser.tab_widget.count() - len(live),
+            'estimated_bytes': sum(self.estimate(webview) for webview in live),
+            'budget_bytes': self.budget,
+            'discard_count': self.discard_count,
+            'reclaimed_bytes': self.reclaimed_bytes,
+            'frozen_tabs': sum(
+                webview.page().lifecycleState() == QWebEnginePage.LifecycleState.Frozen for webview in live
+            ),
+            'freeze_count': self.freeze_count,
+        }
+
 class MyBrowser(QMainWindow):
-    def __init__(self):
+    # Quiet period after the last tab change before the session is saved
+    SESSION_SAVE_DELAY_MS = 1000
+    # Pause between background loads of restored tabs
+    WARM_INTERVAL_MS = 2000
+    # Typing pause before the URL bar asks for suggestions
+    SUGGEST_DELAY_MS = 80
+    # Local search server defaults (see search_server.serve)
+    SEARCH_SERVER_BACKEND = 'threaded'
+    SEARCH_SERVER_WORKERS = 8
+    SEARCH_SERVER_PORT = 5000
+    # The search server starts once per process - every window uses the port it started on
+    server_port = None
+    server_url = None
+    # One writer for every window: snapshots cover the whole app and must land in order
+    session_writer = None
+    
+    def __init__(self, private=False, restore=True):
         super().__init__()
         self.setWindowTitle("🚀 Go Through - Ultimate Browser")
         self.setGeometry(50, 50, 1800, 1000)
@@ -837,8 +1635,7 @@ class MyBrowser(QMainWindow):
         self.download_path = "Downloads"
         os.makedirs(self.download_path, exist_ok=True)
         
-        self.is_incognito = False
-        self.adblock_enabled = True
+        self.is_incognito = private
         self.normal_profile = QWebEngineProfile.defaultProfile()
         self.incognito_profile = QWebEngineProfile()
         
@@ -846,19 +1643,68 @@ class MyBrowser(QMainWindow):
         self.normal_profile.downloadRequested.connect(self.handle_download)
         self.incognito_profile.downloadRequested.connect(self.handle_download)
         
-        self.downloads = []
         self.db = BrowserDatabase()
+        self.download_registry = DownloadRegistry(self.db, self)
+        self.download_registry.updated.connect(self.on_download_progress)
+        self.download_registry.finished.connect(self.on_download_finished)
+        self.history_writer = HistoryWriter(self.db.db_path)
+        self.background_tasks = []
+        self.suggestion_cache = NarrowingCache(self.suggestion_rows)
+        self.db.add_change_listener(self.suggestion_cache.invalidate)
+        
+        # URL bar suggestions - debounced, looked up on a worker thread
+        self.suggestion_generation = 0
+        self.suggestion_worker = SuggestionWorker(self.lookup_suggestions, self.db, self)
+        self.suggestion_worker.ready.connect(self.show_suggestions)
+        self.suggestion_worker.start()
+        self.suggestion_timer = QTimer(self)
+        self.suggestion_timer.setSingleShot(True)
+        self.suggestion_timer.setInterval(self.SUGGEST_DELAY_MS)
+        self.suggestion_timer.timeout.connect(self.request_suggestions)
+        
+        # Ad blocking for every subresource - one app-wide blocker covers every window's profiles
+        self.adblocker = AdBlocker.instance(self.db.db_path)
+        self.adblocker.register(self)
+        
         self.zoom_factor = 1.0
         self.find_text = ""
         self.is_fullscreen = False
         self.settings = self.load_settings()
-        self.session_urls = []
+        if MyBrowser.server_url is None:
+            MyBrowser.server_port = self.settings['search_server_port']
+            MyBrowser.server_url = f"http://127.0.0.1:{MyBrowser.server_port}"
+        self.child_windows = []
+        
+        # Session autosave - debounced, written by the app's session writer thread
+        if MyBrowser.session_writer is None:
+            MyBrowser.session_writer = SessionWriter(self.db.db_path)
+        self.session_timer = QTimer(self)
+        self.session_timer.setSingleShot(True)
+        self.session_timer.setInterval(self.SESSION_SAVE_DELAY_MS)
+        self.session_timer.timeout.connect(self.save_session)
+        
+        # Lazy session restore - placeholders open on activation, a few warm up in the background
+        self.restoring_session = False
+        self.current_tab = None
+        self.warm_queue = []
+        self.warm_timer = QTimer(self)
+        self.warm_timer.setInterval(self.WARM_INTERVAL_MS)
+        self.warm_timer.timeout.connect(self.warm_next_tab)
         
         # Initialize UI after core elements exist
         self.init_ui()
         self.setup_shortcuts()
         self.start_search_server()
-        self.restore_session()
+        self.tab_widget.currentChanged.connect(self.on_current_tab_changed)
+        self.tab_widget.currentChanged.connect(lambda: self.update_navigation_buttons())
+        self.tab_widget.currentChanged.connect(lambda: self.adblocker.stats.update_button(self))
+        self.tab_lifecycle = TabLifecycleManager(
+            self, self.settings.get('tab_memory_budget_mb', 1024), self.settings.get('freeze_background_tabs_after', 300)
+        )
+        if restore and not private:
+            self.restore_session()
+        self.tab_widget.currentChanged.connect(self.schedule_session_save)
+        self.tab_widget.tabBar().tabMoved.connect(self.schedule_session_save)
     
     def start_search_server(self):
         """Start Flask search server in background thread"""
@@ -875,7 +1721,11 @@ class MyBrowser(QMainWindow):
             import logging
             log = logging.getLogger('werkzeug')
             log.setLevel(logging.ERROR)
-            search_server.app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False)
+            search_server.serve(
+                '127.0.0.1', self.server_port,
+                self.settings.get('search_server_backend', 'threaded'),
+                self.settings.get('search_server_workers', 8)
+            )
         
         server_thread = threading.Thread(target=run_server, daemon=True)
         server_thread.start()
@@ -906,9 +1756,14 @@ class MyBrowser(QMainWindow):
         # Add real-time search suggestions
         from PyQt6.QtWidgets import QCompleter
         from PyQt6.QtCore import QStringListModel
-        self.completer = QCompleter()
+        # One model for the window's lifetime, refilled as results arrive
+        self.suggestion_model = QStringListModel(self)
+        self.completer = QCompleter(self.suggestion_model, self)
+        # Results are already matched and ranked - show them as they are
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
         self.url_bar.setCompleter(self.completer)
-        self.url_bar.textChanged.connect(self.on_url_text_changed)
+        # Typing only; URL updates from navigation don't need suggestions
+        self.url_bar.textEdited.connect(self.on_url_text_changed)
         
         # Configure tab widget (already created in __init__)
         self.tab_widget.setTabsClosable(True)
@@ -946,7 +1801,7 @@ class MyBrowser(QMainWindow):
         self.setStatusBar(self.status_bar)
         
         # Add first tab
-        self.add_new_tab("http://127.0.0.1:5000")
+        self.add_new_tab(self.server_url)
     
     def create_toolbar(self, layout):
         toolbar_widget = QWidget()
@@ -1078,49 +1933,172 @@ class MyBrowser(QMainWindow):
         layout.addWidget(toolbar_widget)
     
     def current_webview(self):
-        """Get current QWebEngineView directly"""
-        if self.tab_widget.count() == 0:
+        """Get current QWebEngineView directly (None while a placeholder is showing)"""
+        widget = self.tab_widget.currentWidget()
+        if widget is None or isinstance(widget, TabPlaceholder):
             return None
-        return self.tab_widget.currentWidget()
+        return widget
     
     def add_new_tab(self, url=None):
         """Add new tab - ultra simple version"""
         if url is None:
-            url = "http://127.0.0.1:5000/"
+            url = f"{self.server_url}/"
         
         try:
-            # Create basic webview without any profiles or AdBlock
-            webview = QWebEngineView()
+            webview = self.create_webview(url)
             
             # Add to tab
             index = self.tab_widget.addTab(webview, "New Tab")
             self.tab_widget.setCurrentIndex(index)
             
-            # Load URL
-            if url and isinstance(url, str):
-                webview.load(QUrl(url))
-            else:
-                webview.load(QUrl("http://127.0.0.1:5000/"))
-            
-            # Simple signal connections
-            webview.titleChanged.connect(
-                lambda title: self.tab_widget.setTabText(index, title[:30] + "..." if len(title) > 30 else title)
-            )
-            webview.urlChanged.connect(
-                lambda url: self.url_bar.setText(url.toString()) if self.tab_widget.currentIndex() == index else None
-            )
-            webview.urlChanged.connect(lambda: self.update_navigation_buttons())
-            webview.loadFinished.connect(lambda: self.update_navigation_buttons())
-            
             print("New tab created successfully")
             
         except Exception as e:
             print(f"FAILED to create tab: {e}")
             import traceback
             traceback.print_exc()
+    
+    def create_webview(self, url):
+        """Build a tab's web view, wire up its signals and start loading url"""
+        webview = QWebEngineView()
+        profile = self.incognito_profile if self.is_incognito else self.normal_profile
+        webview.setPage(QWebEnginePage(profile, webview))
+        webview.hidden_since = time.time()
+        webview.blocked_requests = 0
+        webview.blocked_bytes = 0
+        
+        # Load URL
+        if url and isinstance(url, str):
+            webview.load(QUrl(url))
+        else:
+            webview.load(QUrl(f"{self.server_url}/"))
+        
+        # Simple signal connections (look the tab up each time - tabs move)
+        webview.titleChanged.connect(
+            lambda title: self.tab_widget.setTabText(self.tab_widget.indexOf(webview), title[:30] + "..." if len(title) > 30 else title)
+        )
+        webview.urlChanged.connect(
+            lambda url: self.url_bar.setText(url.toString()) if self.tab_widget.currentWidget() is webview else None
+        )
+        webview.urlChanged.connect(lambda: self.update_navigation_buttons())
+        webview.loadFinished.connect(lambda: self.update_navigation_buttons())
+        webview.loadFinished.connect(lambda ok: self.on_tab_load_finished(webview))
+        webview.urlChanged.connect(self.schedule_session_save)
+        webview.titleChanged.connect(self.schedule_session_save)
+        webview.loadStarted.connect(lambda: self.reset_blocked_count(webview))
+        return webview
+    
+    def reset_blocked_count(self, webview):
+        """Start a tab's blocked counter over when it loads a new page"""
+        webview.blocked_requests = 0
+        webview.blocked_bytes = 0
+        if self.tab_widget.currentWidget() is webview:
+            self.adblocker.stats.update_button(self)
+    
+    def add_placeholder_tab(self, url, title='', pinned=False, last_active=0):
+        """Add a restored tab that only builds its web view once activated"""
+        placeholder = TabPlaceholder(url, title, pinned, last_active)
+        text = title[:30] + "..." if len(title) > 30 else title
+        index = self.tab_widget.addTab(placeholder, text or url)
+        self.tab_widget.setTabToolTip(index, url)
+        return placeholder
+    
+    def materialize_tab(self, index):
+        """Swap a placeholder tab for a real web view and start loading it"""
+        placeholder = self.tab_widget.widget(index)
+        if not isinstance(placeholder, TabPlaceholder):
+            return None
+        if placeholder in self.warm_queue:
+            self.warm_queue.remove(placeholder)
         
-        # Update navigation when tab changes
-        self.tab_widget.currentChanged.connect(lambda: self.update_navigation_buttons())
+        webview = self.create_webview(placeholder.saved_url)
+        webview.is_pinned = placeholder.is_pinned
+        webview.last_active = placeholder.last_active
+        
+        # Discarded tabs come back where the user left them
+        if placeholder.scroll_position:
+            x, y = (float(v) for v in placeholder.scroll_position)
+            
+            def restore_scroll(ok):
+                webview.loadFinished.disconnect(restore_scroll)
+                if ok:
+                    webview.page().runJavaScript(f"window.scrollTo({x}, {y})")
+            
+            webview.loadFinished.connect(restore_scroll)
+        
+        self.replace_tab_widget(index, webview)
+        placeholder.deleteLater()
+        return webview
+    
+    def discard_tab(self, index):
+        """Turn a background tab back into a placeholder, freeing its view and renderer"""
+        webview = self.tab_widget.widget(index)
+        if webview is None or isinstance(webview, TabPlaceholder) or index == self.tab_widget.currentIndex():
+            return None
+        placeholder = TabPlaceholder(
+            webview.url().toString(), webview.title(),
+            getattr(webview, 'is_pinned', False), getattr(webview, 'last_active', 0)
+        )
+        placeholder.scroll_position = getattr(webview, 'scroll_position', None)
+        self.replace_tab_widget(index, placeholder)
+        webview.deleteLater()
+        return placeholder
+    
+    def replace_tab_widget(self, index, widget):
+        """Swap the widget of a tab in place without re-entering the currentChanged handlers"""
+        was_current = self.tab_widget.currentIndex() == index
+        self.tab_widget.blockSignals(True)
+        try:
+            self.tab_widget.insertTab(index, widget, self.tab_widget.tabText(index))
+            self.tab_widget.setTabToolTip(index, self.tab_widget.tabToolTip(index + 1))
+            self.tab_widget.removeTab(index + 1)
+            if was_current:
+                self.tab_widget.setCurrentIndex(index)
+        finally:
+            self.tab_widget.blockSignals(False)
+    
+    def on_current_tab_changed(self, index):
+        """Remember when each tab was last used and open placeholders on first visit"""
+        widget = self.tab_widget.widget(index)
+        if widget is None or self.restoring_session:
+            return
+        now = time.time()
+        if self.current_tab is not None and self.current_tab is not widget:
+            self.current_tab.hidden_since = now
+        self.current_tab = widget
+        widget.last_active = now
+        if isinstance(widget, QWebEngineView):
+            self.tab_lifecycle.wake(widget)
+        elif isinstance(widget, TabPlaceholder):
+            webview = self.materialize_tab(index)
+            if webview is not None:
+                # Track the view now in the tab, so its hidden time starts when it is left
+                self.current_tab = webview
+                webview.hidden_since = now
+            self.url_bar.setText(widget.saved_url)
+            self.update_navigation_buttons()
+    
+    def start_warm_loader(self):
+        """Preload the most recently used restored tabs, one per WARM_INTERVAL_MS"""
+        count = self.settings.get('warm_restored_tabs', 0)
+        placeholders = [
+            self.tab_widget.widget(i) for i in range(self.tab_widget.count())
+            if isinstance(self.tab_widget.widget(i), TabPlaceholder)
+        ]
+        placeholders.sort(key=lambda tab: tab.last_active, reverse=True)
+        self.warm_queue = placeholders[:count]
+        if self.warm_queue:
+            self.warm_timer.start()
+    
+    def warm_next_tab(self):
+        while self.warm_queue:
+            # Skip tabs closed since the restore
+            index = self.tab_widget.indexOf(self.warm_queue.pop(0))
+            if index != -1:
+                self.materialize_tab(index)
+                break
+        if not self.warm_queue:
+            self.warm_timer.stop()
     
     def on_tab_load_finished(self, webview):
         """Handle tab load finished"""
@@ -1131,20 +2109,26 @@ class MyBrowser(QMainWindow):
         if not self.is_incognito:
             url = webview.url().toString()
             title = webview.title()
-            if url and not url.startswith('http://127.0.0.1:5000'):
-                self.db.add_history_entry(url, title)
+            if url and not url.startswith(self.server_url):
+                self.history_writer.add_visit(url, title)
                 self.status_label.setText(f"📜 Tracked: {title[:30]}{'...' if len(title) > 30 else ''}")
         else:
             self.status_label.setText("🕶️ Private browsing - no tracking")
     
     def close_tab(self, index):
         if self.tab_widget.count() > 1:
+            widget = self.tab_widget.widget(index)
             self.tab_widget.removeTab(index)
+            if widget in self.warm_queue:
+                self.warm_queue.remove(widget)
+            # removeTab only detaches the widget - free the view and its renderer
+            widget.deleteLater()
             self.update_navigation_buttons()
+            self.schedule_session_save()
     
     def update_navigation_buttons(self):
         """Update navigation buttons - SIMPLE VERSION"""
-        webview = self.tab_widget.currentWidget()
+        webview = self.current_webview()
         if webview:
             history = webview.history()
             if history:
@@ -1156,13 +2140,13 @@ class MyBrowser(QMainWindow):
     
     def go_back(self):
         """Go back - SIMPLE VERSION"""
-        webview = self.tab_widget.currentWidget()
+        webview = self.current_webview()
         if webview:
             webview.back()
     
     def go_forward(self):
         """Go forward - SIMPLE VERSION"""
-        webview = self.tab_widget.currentWidget()
+        webview = self.current_webview()
         if webview:
             webview.forward()
     
@@ -1174,23 +2158,37 @@ class MyBrowser(QMainWindow):
     def go_home(self):
         webview = self.current_webview()
         if webview:
-            webview.load(QUrl("http://127.0.0.1:5000/"))
+            webview.load(QUrl(f"{self.server_url}/"))
     
     def on_url_text_changed(self, text):
-        """Handle real-time search suggestions with QStringListModel"""
-        if len(text) >= 2:
-            try:
-                # Get suggestions from database
-                suggestions = self.db.get_suggestions(text)
-                if suggestions:
-                    # Extract URLs for completion
-                    suggestion_urls = [url for url, title in suggestions]
-                    from PyQt6.QtCore import QStringListModel
-                    model = QStringListModel(suggestion_urls)
-                    self.completer.setModel(model)
-            except Exception as e:
-                print(f"Suggestion error: {e}")
-                pass
+        """Debounce suggestion lookups; each keystroke makes earlier results outdated"""
+        self.suggestion_generation += 1
+        if len(text.strip()) >= 2:
+            self.suggestion_timer.start()
+        else:
+            self.suggestion_timer.stop()
+            self.suggestion_model.setStringList([])
+    
+    def request_suggestions(self):
+        self.suggestion_worker.request(self.suggestion_generation, self.url_bar.text())
+    
+    def lookup_suggestions(self, text):
+        """URLs to suggest for text (runs on the suggestion worker thread)"""
+        return [url for url, title in self.suggestion_cache.lookup('url_bar', text, limit=5)]
+    
+    def show_suggestions(self, generation, text, urls):
+        """Fill the completer's model with results that are still current"""
+        if generation != self.suggestion_generation:
+            return  # typed on since this was asked
+        if urls != self.suggestion_model.stringList():
+            self.suggestion_model.setStringList(urls)
+        if urls and self.url_bar.hasFocus():
+            self.completer.complete()
+    
+    def suggestion_rows(self, text, limit):
+        """Suggestion cache backend: history matches, all of them if the LIMITed query came back short"""
+        rows = self.db.get_suggestions(text, limit=limit)
+        return rows, len(rows) < limit
     
     def navigate_to_url(self):
         text = self.url_bar.text().strip()
@@ -1215,23 +2213,28 @@ class MyBrowser(QMainWindow):
     
     def toggle_incognito(self):
         """Open private browsing window with OffTheRecord profile"""
-        private_browser = MyBrowser()
+        private_browser = MyBrowser(private=True)
         private_browser.setWindowTitle("🕶️ Private Browsing - Go Through")
-        private_browser.is_incognito = True
         
-        # Create OffTheRecord profile for true private browsing
-        private_browser.incognito_profile = QWebEngineProfile.defaultProfile().offTheRecord()
+        # QWebEngineProfile() without a storage name is already off the record
         private_browser.incognito_profile.setHttpCacheType(QWebEngineProfile.HttpCacheType.MemoryHttpCache)
         private_browser.incognito_profile.setPersistentCookiesPolicy(QWebEngineProfile.PersistentCookiesPolicy.NoPersistentCookies)
         
         private_browser.show()
         self.status_label.setText("🕶️ Private window opened")
     
+    @property
+    def adblock_enabled(self):
+        return self.adblocker.enabled
+    
     def toggle_adblock(self):
-        self.adblock_enabled = not self.adblock_enabled
-        self.adblock_btn.setText("🚫" if self.adblock_enabled else "🚫")
+        """Switch ad blocking for every window - they share one blocker"""
+        self.adblocker.set_enabled(not self.adblocker.enabled)
         self.status_label.setText(f"🚫 AdBlock {'ON' if self.adblock_enabled else 'OFF'}")
     
+    def show_status(self, text):
+        self.status_label.setText(text)
+    
     def add_bookmark(self):
         webview = self.current_webview()
         if webview:
@@ -1247,6 +2250,7 @@ class MyBrowser(QMainWindow):
         current_tab = self.tab_widget.currentWidget()
         if current_tab and hasattr(current_tab, 'pin_tab'):
             current_tab.pin_tab()
+            self.schedule_session_save()
     
     def show_downloads(self):
         """Show downloads manager dialog"""
@@ -1312,30 +2316,22 @@ class MyBrowser(QMainWindow):
         download_item.setDownloadFileName(os.path.basename(path))
         download_item.accept()
         
-        # Track download
-        download_data = {
-            'filename': filename,
-            'path': path,
-            'status': 'Downloading',
-            'timestamp': time.time()
-        }
-        self.downloads.append(download_data)
+        # Track download (progress is persisted by the registry)
+        self.download_registry.track(download_item, path)
         self.status_label.setText(f"⬇️ Downloading: {filename}")
-        
-        # Update when finished
-        download_item.finished.connect(lambda: self.on_download_finished(download_data))
-        download_item.downloadProgress.connect(self.on_download_progress)
     
-    def on_download_finished(self, download_data):
-        """Handle download completion"""
-        download_data['status'] = 'Completed'
-        self.status_label.setText(f"✅ Downloaded: {download_data['filename']}")
-    
-    def on_download_progress(self, bytes_received, bytes_total):
-        """Handle download progress"""
-        if bytes_total > 0:
-            progress = int((bytes_received / bytes_total) * 100)
-            self.progress_bar.setValue(progress)
+    def on_download_finished(self, download):
+        """Handle download completion, cancellation or interruption"""
+        icons = {'Completed': "✅ Downloaded", 'Cancelled': "🚫 Download cancelled", 'Interrupted': "⚠️ Download interrupted"}
+        self.status_label.setText(f"{icons[download['state']]}: {download['filename']}")
+        if not self.download_registry.active:
+            self.progress_bar.hide()
+    
+    def on_download_progress(self, download_ids):
+        """Show combined progress of live downloads (once per registry flush)"""
+        received, total = self.download_registry.overall_progress()
+        if total > 0:
+            self.progress_bar.setValue(int(received * 100 / total))
             self.progress_bar.show()
     
     def load_settings(self):
@@ -1352,22 +2348,6 @@ class MyBrowser(QMainWindow):
             'default_zoom': '100%'
         }
     
-    def save_session(self):
-        """Save current session"""
-        self.session_urls = []
-        for i in range(self.tab_widget.count()):
-            webview = self.tab_widget.widget(i)
-            if webview:
-                url = webview.url().toString()
-                if url and not url.startswith('about:blank'):
-                    self.session_urls.append(url)
-    
-    def restore_session(self):
-        """Restore previous session"""
-        if self.settings.get('restore_session', False) and self.session_urls:
-            for url in self.session_urls:
-                self.add_new_tab(url)
-    
     def setup_shortcuts(self):
         """Setup keyboard shortcuts"""
         from PyQt6.QtGui import QKeySequence
@@ -1420,13 +2400,25 @@ class MyBrowser(QMainWindow):
         try:
             # Default settings
             settings = {
-                'homepage': 'http://127.0.0.1:5000',
+                'homepage': f"http://127.0.0.1:{self.SEARCH_SERVER_PORT}",
                 'search_engine': 'local',
                 'theme': 'light',
                 'adblock': True,
                 'incognito': False,
-                'zoom_level': 1.0
+                'zoom_level': 1.0,
+                'lazy_restore': True,
+                'warm_restored_tabs': 3,
+                'tab_memory_budget_mb': 1024,
+                'freeze_background_tabs_after': 300,
+                'search_server_backend': self.SEARCH_SERVER_BACKEND,
+                'search_server_workers': self.SEARCH_SERVER_WORKERS,
+                'search_server_port': self.SEARCH_SERVER_PORT
             }
+            # The search server is only started once, so its options are kept for the next launch
+            settings['search_server_backend'] = self.db.get_setting('search_server_backend', self.SEARCH_SERVER_BACKEND)
+            settings['search_server_workers'] = int(self.db.get_setting('search_server_workers', self.SEARCH_SERVER_WORKERS))
+            settings['search_server_port'] = int(self.db.get_setting('search_server_port', self.SEARCH_SERVER_PORT))
+            settings['homepage'] = f"http://127.0.0.1:{settings['search_server_port']}"
             return settings
         except:
             return settings
@@ -1561,11 +2553,13 @@ class MyBrowser(QMainWindow):
         open_btn = QPushButton("🌐 Open")
         delete_btn = QPushButton("🗑️ Delete Selected")
         clear_btn = QPushButton("🗑️ Clear All")
+        export_btn = QPushButton("📤 Export")
         close_btn = QPushButton("❌ Close")
         
         button_layout.addWidget(open_btn)
         button_layout.addWidget(delete_btn)
         button_layout.addWidget(clear_btn)
+        button_layout.addWidget(export_btn)
         button_layout.addWidget(close_btn)
         layout.addLayout(button_layout)
         
@@ -1588,13 +2582,13 @@ class MyBrowser(QMainWindow):
             reply = QMessageBox.question(self, "Clear History", "Clear all browsing history?", 
                                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             if reply == QMessageBox.StandardButton.Yes:
-                self.db.clear_history()
                 list_widget.clear()
-                self.status_label.setText("🗑️ History cleared")
+                self.clear_history_range(None)
         
         open_btn.clicked.connect(open_history)
         delete_btn.clicked.connect(delete_selected)
         clear_btn.clicked.connect(clear_all)
+        export_btn.clicked.connect(lambda: self.export_data('history', dialog))
         close_btn.clicked.connect(dialog.reject)
         
         # Search functionality
@@ -1641,11 +2635,13 @@ class MyBrowser(QMainWindow):
         open_btn = QPushButton("🌐 Open")
         edit_btn = QPushButton("✏️ Edit")
         delete_btn = QPushButton("🗑️ Delete")
+        export_btn = QPushButton("📤 Export")
         close_btn = QPushButton("❌ Close")
         
         button_layout.addWidget(open_btn)
         button_layout.addWidget(edit_btn)
         button_layout.addWidget(delete_btn)
+        button_layout.addWidget(export_btn)
         button_layout.addWidget(close_btn)
         layout.addLayout(button_layout)
         
@@ -1666,8 +2662,7 @@ class MyBrowser(QMainWindow):
                 new_title, ok = QInputDialog.getText(self, "Edit Bookmark", "Title:", text=title)
                 if ok and new_title:
                     # Update in database
-                    self.db.cursor.execute("UPDATE bookmarks SET title = ? WHERE url = ?", (new_title, url))
-                    self.db.conn.commit()
+                    self.db.update_bookmark(url, new_title)
                     # Update UI
                     item_text = f"{new_title[:60]}{'...' if len(new_title) > 60 else ''}"
                     current_item.setText(item_text)
@@ -1680,14 +2675,14 @@ class MyBrowser(QMainWindow):
                 reply = QMessageBox.question(self, "Delete Bookmark", f"Delete bookmark '{title}'?", 
                                            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
                 if reply == QMessageBox.StandardButton.Yes:
-                    self.db.cursor.execute("DELETE FROM bookmarks WHERE url = ?", (url,))
-                    self.db.conn.commit()
+                    self.db.delete_bookmark(url)
                     list_widget.takeItem(list_widget.row(current_item))
                     self.status_label.setText("🗑️ Bookmark deleted")
         
         open_btn.clicked.connect(open_bookmark)
         edit_btn.clicked.connect(edit_bookmark)
         delete_btn.clicked.connect(delete_bookmark)
+        export_btn.clicked.connect(lambda: self.export_data('bookmarks', dialog))
         close_btn.clicked.connect(dialog.reject)
         
         # Search functionality
@@ -1739,6 +2734,25 @@ class MyBrowser(QMainWindow):
         adblock_check.setChecked(self.settings['adblock'])
         layout.addWidget(adblock_check)
         
+        # Local search server - read when the browser starts
+        server_layout = QHBoxLayout()
+        server_layout.addWidget(QLabel("Search Server:"))
+        server_combo = QComboBox()
+        server_combo.addItems(["Threaded", "Waitress", "Development"])
+        server_combo.setCurrentText(self.settings['search_server_backend'].title())
+        server_layout.addWidget(server_combo)
+        server_layout.addWidget(QLabel("Workers:"))
+        workers_spin = QSpinBox()
+        workers_spin.setRange(1, 64)
+        workers_spin.setValue(self.settings['search_server_workers'])
+        server_layout.addWidget(workers_spin)
+        server_layout.addWidget(QLabel("Port:"))
+        port_spin = QSpinBox()
+        port_spin.setRange(1024, 65535)
+        port_spin.setValue(self.settings['search_server_port'])
+        server_layout.addWidget(port_spin)
+        layout.addLayout(server_layout)
+        
         # Buttons
         button_layout = QHBoxLayout()
         save_btn = QPushButton("💾 Save")
@@ -1758,9 +2772,11 @@ class MyBrowser(QMainWindow):
             self.settings['adblock'] = adblock_check.isChecked()
             
             # Apply settings
-            self.adblock_enabled = self.settings['adblock']
-            self.adblock_btn.setText("🚫" if self.adblock_enabled else "🚫")
-            self.status_label.setText("⚙️ Settings saved")
+            self.adblocker.set_enabled(self.settings['adblock'])
+            if self.save_server_settings(server_combo.currentText().lower(), workers_spin.value(), port_spin.value()):
+                self.status_label.setText("⚙️ Settings saved - search server changes apply after a restart")
+            else:
+                self.status_label.setText("⚙️ Settings saved")
         
         def reset_settings():
             reply = QMessageBox.question(self, "Reset Settings", "Reset all settings to defaults?", 
@@ -1771,6 +2787,10 @@ class MyBrowser(QMainWindow):
                 search_combo.setCurrentText(self.settings['search_engine'].title())
                 theme_combo.setCurrentText(self.settings['theme'].title())
                 adblock_check.setChecked(self.settings['adblock'])
+                self.save_server_settings(self.SEARCH_SERVER_BACKEND, self.SEARCH_SERVER_WORKERS, self.SEARCH_SERVER_PORT)
+                server_combo.setCurrentText(self.SEARCH_SERVER_BACKEND.title())
+                workers_spin.setValue(self.SEARCH_SERVER_WORKERS)
+                port_spin.setValue(self.SEARCH_SERVER_PORT)
                 self.status_label.setText("⚙️ Settings reset")
         
         save_btn.clicked.connect(save_settings)
@@ -1780,6 +2800,15 @@ class MyBrowser(QMainWindow):
         dialog.setLayout(layout)
         dialog.exec()
     
+    def save_server_settings(self, backend, workers, port):
+        """Store the search server options for the next launch; returns True if they changed"""
+        options = {'search_server_backend': backend, 'search_server_workers': workers, 'search_server_port': port}
+        changed = {key: value for key, value in options.items() if self.settings[key] != value}
+        for key, value in changed.items():
+            self.settings[key] = value
+            self.db.set_setting(key, str(value))
+        return bool(changed)
+    
     def clear_browsing_data(self):
         """Clear browsing data dialog"""
         dialog = QDialog(self)
@@ -1819,19 +2848,17 @@ class MyBrowser(QMainWindow):
         
         # Connect signals
         def clear_data():
-            if history_check.isChecked():
-                self.db.clear_history()
-            if bookmarks_check.isChecked():
-                self.db.cursor.execute("DELETE FROM bookmarks")
-                self.db.conn.commit()
-            
             cleared_items = []
-            if history_check.isChecked():
-                cleared_items.append("History")
             if bookmarks_check.isChecked():
+                self.db.clear_bookmarks()
                 cleared_items.append("Bookmarks")
             
-            if cleared_items:
+            if history_check.isChecked():
+                # Reported once the background delete has finished
+                seconds = TIME_RANGES[time_combo.currentText()]
+                now = time.time()
+                self.clear_history_range(now - seconds if seconds else None, now, cleared=cleared_items)
+            elif cleared_items:
                 self.status_label.setText(f"🗑️ Cleared: {', '.join(cleared_items)}")
                 QMessageBox.information(self, "Clear Complete", f"Cleared: {', '.join(cleared_items)}")
             dialog.accept()
@@ -1842,54 +2869,186 @@ class MyBrowser(QMainWindow):
         dialog.setLayout(layout)
         dialog.exec()
     
+    def clear_history_range(self, since, until=None, cleared=None):
+        """Delete history in [since, until) on a worker thread, in chunks
+
+        until defaults to now, so pages visited while the delete runs are
+        kept. Given cleared (names of data already deleted alongside it), a
+        "Clear Complete" box lists them and History once the delete succeeds.
+        """
+        def on_done(removed):
+            self.status_label.setText(f"🗑️ History cleared ({removed:,} pages removed)")
+            if cleared is not None:
+                items = ', '.join([*cleared, "History"])
+                QMessageBox.information(self, "Clear Complete", f"Cleared: {items}")
+        
+        if until is None:
+            until = time.time()
+        self.run_background_task("🗑️ Clearing history", self.db.delete_history_range, since, until, on_done=on_done)
+    
+    def export_data(self, kind, parent=None):
+        """Export 'bookmarks' or 'history' to a user-chosen file on a worker thread"""
+        filters = {"Netscape HTML (*.html)": ".html", "JSON Lines (*.jsonl)": ".jsonl", "CSV (*.csv)": ".csv"}
+        file_path, selected = QFileDialog.getSaveFileName(parent or self, f"Export {kind.title()}", f"{kind}.html", ";;".join(filters))
+        if not file_path:
+            return
+        if not os.path.splitext(file_path)[1]:
+            file_path += filters.get(selected, ".html")
+        
+        def on_done(count):
+            self.status_label.setText(f"📤 Exported {count:,} {kind} entries to {os.path.basename(file_path)}")
+        
+        job = self.db.export_bookmarks if kind == 'bookmarks' else self.db.export_history
+        self.run_background_task(f"📤 Exporting {kind}", job, file_path, on_done=on_done)
+    
+    def run_background_task(self, label, job, *args, on_done=None, **kwargs):
+        """Run a database job on a BackgroundTask with status bar progress"""
+        task = BackgroundTask(job, *args, parent=self, **kwargs)
+        
+        def on_progress(done, total):
+            percent = int(done * 100 / total) if total else 100
+            self.progress_bar.setValue(percent)
+            self.status_label.setText(f"{label}... {percent}%")
+        
+        def on_succeeded(result):
+            self.progress_bar.hide()
+            if on_done:
+                on_done(result)
+        
+        def on_failed(error):
+            self.progress_bar.hide()
+            self.status_label.setText(f"❌ {label} failed: {error}")
+        
+        task.progress.connect(on_progress)
+        task.succeeded.connect(on_succeeded)
+        task.failed.connect(on_failed)
+        task.finished.connect(lambda: self.background_tasks.remove(task))
+        self.background_tasks.append(task)
+        
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        task.start()
+        return task
+    
     def track_history(self, url, title):
         """Track page visit in history"""
-        self.db.add_history_entry(url, title)
+        self.history_writer.add_visit(url, title)
+    
+    def schedule_session_save(self, *args):
+        """Save the session once tabs have been quiet for SESSION_SAVE_DELAY_MS"""
+        if not self.is_incognito:
+            self.session_timer.start()
     
-    def save_session(self):
-        """Save current session"""
-        self.session_urls = []
+    def window_state(self):
+        """Tabs of this window as plain data for the session snapshot"""
+        tabs = []
+        active = 0
         for i in range(self.tab_widget.count()):
             tab = self.tab_widget.widget(i)
-            if hasattr(tab, 'webview'):
-                url = tab.webview.url().toString()
-                if url and not url.startswith('about:blank'):
-                    self.session_urls.append(url)
-        
-        # Save to database
-        self.db.cursor.execute("DELETE FROM settings WHERE key = 'session'")
-        self.db.cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", 
-                             ('session', ','.join(self.session_urls)))
-        self.db.conn.commit()
+            webview = getattr(tab, 'webview', tab)
+            url = webview.url().toString()
+            if not url or url.startswith('about:blank'):
+                continue
+            if i == self.tab_widget.currentIndex():
+                active = len(tabs)
+            tabs.append({
+                'url': url, 'title': webview.title(),
+                'pinned': getattr(tab, 'is_pinned', False), 'last_active': getattr(tab, 'last_active', 0),
+            })
+        return {'active': active, 'tabs': tabs}
+    
+    @staticmethod
+    def open_windows():
+        """Visible normal (non-private) browser windows"""
+        return [
+            widget for widget in QApplication.topLevelWidgets()
+            if isinstance(widget, MyBrowser) and not widget.is_incognito and widget.isVisible()
+        ]
+    
+    def save_session(self, closing=None):
+        """Snapshot every normal window except closing and hand it to the session writer"""
+        if self.is_incognito:
+            return
+        self.session_timer.stop()
+        windows = [widget.window_state() for widget in self.open_windows() if widget is not closing]
+        self.session_writer.save({'version': SESSION_VERSION, 'saved_at': time.time(), 'windows': windows})
     
     def restore_session(self):
-        """Restore last session"""
+        """Restore last session (extra windows reopen as windows of their own)"""
         try:
-            self.db.cursor.execute("SELECT value FROM settings WHERE key = 'session'")
-            result = self.db.cursor.fetchone()
-            if result and result[0]:
-                urls = result[0].split(',')
-                # Clear default tab first
-                self.tab_widget.clear()
-                
-                # Restore tabs
-                for url in urls:
-                    if url.strip():
-                        self.add_new_tab(url.strip())
-                
-                self.status_label.setText("🔄 Session restored")
-        except:
-            pass
+            session = self.db.get_session()
+        except sqlite3.Error as e:
+            print(f"Session restore error: {e}")
+            return
+        windows = [w for w in (session or {}).get('windows', []) if w.get('tabs')]
+        if not windows:
+            return
+        
+        self.restore_window(windows[0])
+        for state in windows[1:]:
+            window = MyBrowser(restore=False)
+            window.restore_window(state)
+            window.show()
+            self.child_windows.append(window)
+        self.status_label.setText("🔄 Session restored")
+    
+    def restore_window(self, state):
+        """Replace this window's tabs with a saved window state"""
+        tabs = [tab for tab in state.get('tabs', []) if tab.get('url')]
+        if not tabs:
+            return
+        lazy = self.settings.get('lazy_restore', True)
+        
+        # Clear default tab first
+        self.restoring_session = True
+        try:
+            self.tab_widget.clear()
+            for tab in tabs:
+                if lazy:
+                    self.add_placeholder_tab(tab['url'], tab.get('title') or '', tab.get('pinned', False), tab.get('last_active', 0))
+                else:
+                    self.add_new_tab(tab['url'])
+                    self.tab_widget.currentWidget().is_pinned = tab.get('pinned', False)
+        finally:
+            self.restoring_session = False
+        
+        # Only the active tab loads now
+        self.tab_widget.setCurrentIndex(min(max(state.get('active', 0), 0), self.tab_widget.count() - 1))
+        self.on_current_tab_changed(self.tab_widget.currentIndex())
+        if lazy:
+            self.start_warm_loader()
     
     def closeEvent(self, event):
         """Handle browser close event"""
-        self.save_session()
+        # A window closed while others stay open leaves the session; the last one is kept for restore
+        self.save_session(closing=self if len(self.open_windows()) > 1 else None)
+        self.session_timer.stop()
+        # Stop long-running jobs between chunks
+        for task in list(self.background_tasks):
+            task.cancel()
+            task.wait()
+        # Flush queued history visits and download progress before the connection goes away
+        self.history_writer.close()
+        self.download_registry.close()
+        self.adblocker.unregister(self)
+        self.suggestion_worker.stop()
+        self.db.remove_change_listener(self.suggestion_cache.invalidate)
         self.db.close()
         event.accept()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
+    
+    # Nothing survives a restart mid-download - checked once, before any window starts one
+    interrupted = BrowserDatabase().interrupt_stale_downloads()
+    if interrupted:
+        print(f"⚠️ Marked {interrupted} unfinished downloads as interrupted")
+    
     browser = MyBrowser()
     browser.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    if MyBrowser.session_writer is not None:
+        MyBrowser.session_writer.close()
+    ConnectionPool.close_all()
+    sys.exit(exit_code)
@@ -5,7 +5,7 @@ a = Analysis(
     ['mybrowser.py'],
     pathex=[],
     binaries=[],
-    datas=[('homepage.html', '.'), ('database.py', '.'), ('search_server.py', '.')],
+    datas=[('homepage.html', '.'), ('database.py', '.'), ('search_server.py', '.'), ('import_export.py', '.'), ('adblock.py', '.'), ('autocomplete.py', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -1,8 +1,23 @@
-from flask import Flask, request, render_template_string, render_template, jsonify
+from flask import Flask, Response, request, render_template, jsonify
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from database import BrowserDatabase
+from autocomplete import Autocomplete, NarrowingCache
+import threading
+import selectors
+import hashlib
+import socket
+import gzip
+import time
 import sys
 import os
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
     try:
@@ -16,7 +31,25 @@ def resource_path(relative_path):
 # Set template folder to resource path
 template_path = resource_path('')
 app = Flask(__name__, template_folder=template_path)
+# Pooled connections - each request thread gets its own reader, no per-request setup
 db = BrowserDatabase()
+# All of history and bookmarks in memory for /suggest, loaded in the background
+autocomplete = Autocomplete(db)
+autocomplete.start()
+
+def prefix_matches(query, limit):
+    """(rows, complete) word-prefix matches: the in-memory index, or SQL while it loads"""
+    found = autocomplete.match(query, limit)
+    if found is not None:
+        return found
+    bookmarks = db.search_bookmarks(query, limit=limit)
+    history = db.get_suggestions(query, limit=limit)
+    rows = [(url, title, 'bookmark') for url, title in bookmarks] + [(url, title, 'history') for url, title in history]
+    return rows, len(bookmarks) < limit and len(history) < limit
+
+# Each client's last queries, so "git" -> "gith" -> "githu" filters instead of re-querying
+suggestion_cache = NarrowingCache(prefix_matches)
+db.add_change_listener(suggestion_cache.invalidate)
 
 # SIMPLIFIED SEARCH TEMPLATE - DIRECT RESULTS
 SEARCH_TEMPLATE = """
@@ -147,55 +180,106 @@ SEARCH_TEMPLATE = """
 </body>
 </html>
 """
+# Compiled once - render_template_string() would recompile it on every search
+SEARCH_PAGE = app.jinja_env.from_string(SEARCH_TEMPLATE)
+
+# STATIC ASSETS
+# Revalidate on every load; an unchanged asset costs a 304 with no body
+STATIC_CACHE_CONTROL = 'no-cache'
+# Preferred first; brotli only if the package is installed
+STATIC_ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+class StaticAsset:
+    """A file read and compressed once, served with strong ETags and 304s"""
+
+    def __init__(self, path, mimetype):
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.mimetype = mimetype
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        # encoding -> (body, etag); each representation gets its own strong ETag
+        self.bodies = {'identity': (body, digest)}
+        for encoding in STATIC_ENCODINGS:
+            compressed = brotli.compress(body) if encoding == 'br' else gzip.compress(body, 9)
+            if len(compressed) < len(body):
+                self.bodies[encoding] = (compressed, f"{digest}-{encoding}")
+
+    def response(self):
+        """Best encoding the client accepts, or 304 if it already has it"""
+        encoding = next((e for e in STATIC_ENCODINGS if e in self.bodies and request.accept_encodings[e]), 'identity')
+        body, etag = self.bodies[encoding]
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = STATIC_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
+
+def load_asset(relative_path, mimetype):
+    """StaticAsset for a bundled file, or None if it is missing"""
+    try:
+        return StaticAsset(resource_path(relative_path), mimetype)
+    except OSError as e:
+        print(f"Static asset error: {e}")
+        return None
+
+# Every new tab opens the homepage
+HOMEPAGE = load_asset('homepage.html', 'text/html')
 
 @app.route('/')
 def homepage():
+    if HOMEPAGE is None:
+        return "<h1>Homepage not found</h1><p>Please ensure homepage.html is in the same directory as the browser.</p>"
+    return HOMEPAGE.response()
+
+@app.route('/top')
+def top_sites():
+    """Most frecent pages for the homepage"""
     try:
-        return render_template('homepage.html')
+        sites = db.get_top_sites(limit=8)
     except Exception as e:
-        # Fallback to manual file reading if render_template fails
-        homepage_path = resource_path('homepage.html')
-        try:
-            with open(homepage_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except FileNotFoundError:
-            return f"<h1>Homepage not found</h1><p>Error: {str(e)}</p><p>Please ensure homepage.html is in the same directory as the browser.</p>"
+        print(f"Top sites error: {e}")
+        sites = []
+    return jsonify([{'url': url, 'title': title or url} for url, title in sites])
 
 @app.route('/suggest')
 def suggest():
-    query = request.args.get('q', '').lower().strip()
-    suggestions = []
+    """Up to 5 {url, title, source} completions, best first"""
+    query = request.args.get('q', '').strip()
+    unique_suggestions = []
     
     if len(query) >= 2:
         try:
-            # Get recent history and bookmarks for suggestions
-            history = db.get_history(limit=20)
-            bookmarks = db.get_bookmarks()
-            
-            # Find matching items
-            for url, title in history:
-                if query in title.lower() or query in url.lower():
-                    suggestions.append([title, url])
+            session = request.args.get('session') or request.remote_addr
+            suggestions = suggestion_cache.lookup(session, query, limit=10)
             
-            for url, title in bookmarks:
-                if query in title.lower() or query in url.lower():
-                    suggestions.append([title, url])
+            # Nothing spelled like that - fall back to typo-tolerant matches
+            if not suggestions:
+                suggestions = [(url, title, source) for url, title, source, similarity in db.fuzzy_search(query, limit=5)]
             
             # Remove duplicates and limit to 5
             seen = set()
-            unique_suggestions = []
-            for item in suggestions:
-                if item[0] not in seen:
-                    seen.add(item[0])
-                    unique_suggestions.append(item[0])
+            for url, title, source in suggestions:
+                if url not in seen:
+                    seen.add(url)
+                    unique_suggestions.append({'url': url, 'title': title or url, 'source': source})
                     if len(unique_suggestions) >= 5:
                         break
                         
-        except:
-            pass
+        except Exception as e:
+            print(f"Suggest error: {e}")
     
     return jsonify(unique_suggestions)
 
+@app.route('/stats')
+def stats():
+    """Suggestion cache effectiveness"""
+    return jsonify({'suggest_cache': suggestion_cache.stats()})
+
 @app.route('/search')
 def search():
     query = request.args.get('q', '').lower().strip()
@@ -204,34 +288,214 @@ def search():
     
     if len(query) >= 2:
         try:
-            # Open fresh database connection to prevent connection issues
-            fresh_db = BrowserDatabase()
-            
-            # Search bookmarks first with fuzzy matching
-            bookmarks = fresh_db.get_bookmarks()
-            bookmark_results = [(title, url) for url, title in bookmarks 
-                              if query in title.lower() or query in url.lower()]
+            # Search bookmarks first
+            bookmark_results = [(title, url) for url, title in db.search_bookmarks(query)]
             
-            # Search history second with fuzzy matching
-            history = fresh_db.get_history(limit=50)
-            history_results = [(title, url) for url, title in history 
-                             if query in title.lower() or query in url.lower()]
+            # Search history second - relevance blended with frecency
+            history_results = [(title, url) for url, title, timestamp in db.search_history(query, limit=50)]
             
             # Combine results, prioritize bookmarks
-            results = bookmark_results + [h for h in history_results if h not in bookmark_results]
+            bookmark_urls = {url for title, url in bookmark_results}
+            results = bookmark_results + [h for h in history_results if h[1] not in bookmark_urls]
+            
+            # Few exact hits - top up with typo-tolerant matches
+            if len(results) < 5:
+                seen_urls = {url for title, url in results}
+                for url, title, source, similarity in db.fuzzy_search(query, limit=10):
+                    if url not in seen_urls:
+                        seen_urls.add(url)
+                        results.append((title, url))
             
             if results:
                 local_results = True
             else:
                 local_results = False
-                
-            fresh_db.close()
         except Exception as e:
             print(f"Search error: {e}")
             pass
     
-    return render_template_string(SEARCH_TEMPLATE, query=query, results=results, local_results=local_results)
+    return render_template(SEARCH_PAGE, query=query, results=results, local_results=local_results)
+
+# SERVING
+SERVER_BACKENDS = ('threaded', 'waitress', 'development')
+# Seconds a client may take to send a request once it has started arriving
+REQUEST_TIMEOUT = 5
+# Seconds an idle keep-alive connection stays open before the server closes it
+IDLE_TIMEOUT = 60
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """HTTP/1.1 handler answering one request per dispatch
+
+    A connection the client keeps alive goes back to the server to wait for
+    its next request instead of blocking a worker while it is idle.
+    """
+    protocol_version = 'HTTP/1.1'
+    timeout = REQUEST_TIMEOUT
+
+    def setup(self):
+        super().setup()
+        # Reuse the connection's reader - it may already hold the next pipelined request
+        self.rfile.close()
+        self.rfile = self.server.reader(self.connection)
+
+    def finish(self):
+        # The reader stays open with the connection, the server closes it
+        if not self.wfile.closed:
+            try:
+                self.wfile.flush()
+            except OSError:
+                pass
+        self.wfile.close()
+
+    def handle(self):
+        self.close_connection = True
+        try:
+            self.handle_one_request()
+        except (ConnectionError, socket.timeout) as e:
+            self.connection_dropped(e)
+            self.close_connection = True
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server running requests on a fixed pool of worker threads
+
+    Workers only ever run requests. Between requests, kept-alive
+    connections wait in a selector on the accepting thread and are closed
+    after IDLE_TIMEOUT, so the sockets a browser holds open (several per
+    profile) can't occupy the pool while /suggest requests queue behind
+    them.
+    """
+    multithread = True
+
+    def __init__(self, host, port, app, workers=8):
+        super().__init__(host, port, app, handler=KeepAliveRequestHandler)
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='search-server')
+        self.selector = selectors.DefaultSelector()
+        self.idle = {}            # parked connection -> (client address, idle since)
+        self.returned = deque()   # connections workers handed back, parked by the accepting thread
+        self.readers = {}         # open connection -> buffered reader kept across its requests
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._stopping = False
+
+    def serve_forever(self, poll_interval=0.5):
+        self.selector.register(self.socket, selectors.EVENT_READ)
+        self.selector.register(self._wake_reader, selectors.EVENT_READ)
+        try:
+            while not self._stopping:
+                for key, _ in self.selector.select(poll_interval):
+                    if key.fileobj is self.socket:
+                        self._handle_request_noblock()
+                    elif key.fileobj is self._wake_reader:
+                        self._wake_reader.recv(4096)
+                    else:
+                        # The next request on a kept-alive connection is arriving
+                        self.selector.unregister(key.fileobj)
+                        client_address, _ = self.idle.pop(key.fileobj)
+                        self.process_request(key.fileobj, client_address)
+                self._park_returned()
+                self._close_idle()
+        finally:
+            self.server_close()
+
+    def shutdown(self):
+        self._stopping = True
+        self._wake_writer.send(b'\0')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        # Requests the client pipelined are already in the reader, answer them before parking
+        while True:
+            try:
+                keep_alive = not self.RequestHandlerClass(request, client_address, self).close_connection
+            except Exception:
+                self.handle_error(request, client_address)
+                keep_alive = False
+            if not keep_alive or not self._buffered(request):
+                break
+        if keep_alive:
+            self.returned.append((request, client_address))
+            self._wake_writer.send(b'\0')
+        else:
+            self.shutdown_request(request)
+
+    def reader(self, request):
+        """Buffered reader for a connection, the same one for all of its requests"""
+        if request not in self.readers:
+            self.readers[request] = request.makefile('rb', -1)
+        return self.readers[request]
+
+    def _buffered(self, request):
+        """Whether the connection's next request has already been read into its buffer"""
+        request.settimeout(0)
+        try:
+            return bool(self.readers[request].peek(1))
+        except (KeyError, OSError):
+            return False
+        finally:
+            request.settimeout(REQUEST_TIMEOUT)
+
+    def shutdown_request(self, request):
+        reader = self.readers.pop(request, None)
+        if reader is not None:
+            reader.close()
+        super().shutdown_request(request)
+
+    def _park_returned(self):
+        now = time.monotonic()
+        while self.returned:
+            request, client_address = self.returned.popleft()
+            self.idle[request] = (client_address, now)
+            self.selector.register(request, selectors.EVENT_READ)
+
+    def _close_idle(self):
+        deadline = time.monotonic() - IDLE_TIMEOUT
+        for request in [request for request, (_, since) in self.idle.items() if since < deadline]:
+            self.selector.unregister(request)
+            del self.idle[request]
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        # Running requests finish first, so none hands its connection back after the waker closes
+        self.pool.shutdown(wait=True)
+        while self.returned:
+            request, _ = self.returned.popleft()
+            self.shutdown_request(request)
+        for request in list(self.idle):
+            self.shutdown_request(request)
+        self.idle.clear()
+        self.selector.close()
+        self._wake_reader.close()
+        self._wake_writer.close()
+
+_serving = threading.Lock()
+
+def serve(host='127.0.0.1', port=5000, backend='threaded', workers=8):
+    """Serve the app until the process exits; returns False if it is already being served
+
+    backend is one of SERVER_BACKENDS. 'waitress' falls back to the threaded
+    server when the package is not installed.
+    """
+    if not _serving.acquire(blocking=False):
+        return False
+    if backend == 'waitress':
+        try:
+            import waitress
+        except ImportError:
+            print("⚠️ waitress is not installed - using the threaded server")
+            backend = 'threaded'
+        else:
+            waitress.serve(app, host=host, port=port, threads=workers, channel_timeout=IDLE_TIMEOUT, _quiet=True)
+            return True
+    if backend == 'development':
+        app.run(host=host, port=port, debug=False, use_reloader=False)
+    else:
+        PooledWSGIServer(host, port, app, workers).serve_forever()
+    return True
 
 if __name__ == '__main__':
-    print("🚀 Go Through Server running on http://127.0.0.1:5000")
-    app.run(host='127.0.0.1', port=5000, debug=False)
+    backend = sys.argv[1] if len(sys.argv) > 1 else 'threaded'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    print(f"🚀 Go Through Server running on http://127.0.0.1:{port} ({backend})")
+    serve('127.0.0.1', port, backend)
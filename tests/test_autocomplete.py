@@ -0,0 +1,48 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autocomplete import NarrowingCache, PrefixIndex, TOKEN_PATTERN, matches_terms
+
+ROWS = [
+    ('https://github.com/', 'GitHub', 'history'),
+    ('https://gitlab.com/', 'GitLab', 'history'),
+    ('https://docs.python.org/', 'Python docs', 'bookmark'),
+]
+
+class Backend:
+    """Complete matches over ROWS, counting calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, query, limit):
+        self.calls.append(query)
+        terms = TOKEN_PATTERN.findall(query.lower())
+        rows = [row for row in ROWS if terms and matches_terms(terms, row[0], row[1])]
+        return rows[:limit], len(rows) <= limit
+
+def test_query_without_words_does_not_poison_session():
+    backend = Backend()
+    cache = NarrowingCache(backend)
+    assert cache.lookup('s', '!!') == []
+    assert cache.lookup('s', 'github') == [ROWS[0]]
+    assert backend.calls == ['!!', 'github']
+
+def test_longer_query_narrows_cached_rows():
+    backend = Backend()
+    cache = NarrowingCache(backend)
+    assert cache.lookup('s', 'git') == ROWS[:2]
+    assert cache.lookup('s', 'gitl') == [ROWS[1]]
+    assert backend.calls == ['git']
+
+def test_every_word_is_matched_beyond_the_first_words_top_list():
+    index = PrefixIndex()
+    history = [(f'https://example.com/react/{i}', f'React page {i}', 100.0 + i) for i in range(PrefixIndex.TOP_K * 6)]
+    history.append(('https://example.com/hooks', 'React hooks guide', 1.0))
+    index.load(history, [])
+    expected = ([('https://example.com/hooks', 'React hooks guide', 'history')], True)
+    assert index.match('react hooks', 5) == expected
+    assert index.match('hooks react', 5) == expected
+    assert index.match('rea hoo', 5) == expected